@@ -1,17 +1,34 @@
 from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Form, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from generator import generate_csv_data
-from utils import csv_text_to_dataframe, clean_dataframe_for_export
-from predictor import predict_column
-import pandas as pd
+from utils import read_csv_upload, build_table_payload, UploadTooLargeError
+from predictor import predict_column_json, predict_columns_json, HISTORY_MODES
+from prompt_cache import prompt_cache
+from concurrency import run_io, run_cpu, endpoint_limiter, shutdown_executors, AdmittedStreamingResponse, CPU_WORKERS
+from compression import CompressionMiddleware
+from pydantic import BaseModel, Field
+import asyncio
 import zipfile
 import os
 import tempfile
 import json
-import io
 from typing import Optional, Dict, Any, List
-import numpy as np
+
+# Upper bound for synthetic rows returned by /generate
+MAX_ROW_COUNT = 1_000_000
+
+# Limits for /generate/batch
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "500"))
+DEFAULT_BATCH_CONCURRENCY = int(os.getenv("DEFAULT_BATCH_CONCURRENCY", "8"))
+MAX_BATCH_CONCURRENCY = int(os.getenv("MAX_BATCH_CONCURRENCY", "32"))
+
+# Admission control per endpoint (see concurrency.AdmissionLimiter)
+limiters = {
+    "generate": endpoint_limiter("generate", max_concurrent=16, max_queue=64),
+    "generate_batch": endpoint_limiter("generate_batch", max_concurrent=4, max_queue=8),
+    "predict": endpoint_limiter("predict", max_concurrent=max(CPU_WORKERS, 1) * 2, max_queue=16),
+}
 
 # Create a router instead of a FastAPI app
 router = APIRouter()
@@ -20,40 +37,86 @@ router = APIRouter()
 async def root():
     return {"message": "Welcome to DataGen API"}
 
+def fetch_csv_text(prompt: str, dataset_type: str = "tabular"):
+    """Return (csv_text, cache_status), reusing an identical or near-identical earlier prompt if possible."""
+    cached = prompt_cache.lookup(prompt, dataset_type)
+    if cached is not None:
+        return cached
+    # Generate CSV data using existing logic
+    return generate_csv_data(prompt, dataset_type), "fresh"
+
+async def generate_table(
+    prompt: str,
+    dataset_type: str = "tabular",
+    row_count: int = 100,
+    extra: Optional[Dict[str, Any]] = None
+) -> bytes:
+    """Run the full generation pipeline for one prompt and return the JSON response body (plus `extra` fields)."""
+    # The LLM call blocks on I/O; parsing, upsampling and serializing are CPU-bound
+    csv_text, cache_status = await run_io(fetch_csv_text, prompt, dataset_type)
+    body = await run_cpu(build_table_payload, csv_text, row_count, dataset_type, cache=cache_status, **(extra or {}))
+    if cache_status == "fresh":
+        prompt_cache.store(prompt, dataset_type, csv_text)
+    return body
+
 @router.post("/generate")
 async def generate_data(
     prompt: str = Form(...),
     dataset_type: str = Form("tabular"),
-    row_count: int = Form(100),
+    row_count: int = Form(100, ge=1, le=MAX_ROW_COUNT),
 ):
-    try:
-        # Generate CSV data using existing logic
-        csv_text = generate_csv_data(prompt, dataset_type)
-        df = csv_text_to_dataframe(csv_text)
-        
-        # Limit rows if needed
-        if len(df) > row_count:
-            df = df.head(row_count)
+    async with limiters["generate"]:
+        try:
+            # Serialized in the worker; returned as-is so no encoding runs on the event loop
+            body = await generate_table(prompt, dataset_type, row_count)
+            return Response(content=body, media_type="application/json")
             
-        # Clean the dataframe
-        df_clean = clean_dataframe_for_export(df)
-        
-        # Convert to CSV for response
-        csv_data = df_clean.to_csv(index=False, encoding='utf-8')
-        
-        # Prepare response
-        result = {
-            "success": True,
-            "data": csv_data,
-            "columns": list(df_clean.columns),
-            "row_count": len(df_clean),
-            "column_count": len(df_clean.columns)
-        }
-        
-        return JSONResponse(content=result)
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+class GenerateSpec(BaseModel):
+    prompt: str
+    dataset_type: str = "tabular"
+    row_count: int = Field(100, ge=1, le=MAX_ROW_COUNT)
+
+class BatchGenerateRequest(BaseModel):
+    specs: List[GenerateSpec] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+    concurrency: int = Field(DEFAULT_BATCH_CONCURRENCY, ge=1, le=MAX_BATCH_CONCURRENCY)
+
+@router.post("/generate/batch")
+async def generate_batch(request: BatchGenerateRequest):
+    """
+    Generate many tables concurrently and stream them back as NDJSON.
+
+    Each line is one finished table (in completion order) tagged with the
+    `index` of its spec; a failed spec yields an error record instead of
+    failing the whole batch.
+    """
+    # The admission slot is held until the response finishes (see AdmittedStreamingResponse)
+    limiter = limiters["generate_batch"]
+    await limiter.acquire()
+    semaphore = asyncio.Semaphore(request.concurrency)
+
+    async def run(index: int, spec: GenerateSpec) -> bytes:
+        async with semaphore:
+            try:
+                return await generate_table(spec.prompt, spec.dataset_type, spec.row_count, {"index": index, "prompt": spec.prompt})
+            except Exception as e:
+                print(f"Batch item {index} failed: {str(e)}")
+                return json.dumps({"index": index, "prompt": spec.prompt, "success": False, "error": str(e)}).encode()
+
+    async def stream():
+        tasks = [asyncio.create_task(run(i, spec)) for i, spec in enumerate(request.specs)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                record = await finished
+                yield record + b"\n"
+        finally:
+            # Client went away: stop work that has not started yet
+            for task in tasks:
+                task.cancel()
+
+    return AdmittedStreamingResponse(stream(), limiter, media_type="application/x-ndjson")
 
 @router.post("/predict")
 async def predict_data(
@@ -61,124 +124,111 @@ async def predict_data(
     column: str = Form(None),
     steps: int = Form(5, ge=1, le=30),
     time_column: str = Form(None),
-    group_column: str = Form(None)
+    group_column: str = Form(None),
+    history: str = Form("full"),
+    history_points: int = Form(500, ge=2, le=100_000)
 ):
-    try:
-        print(f"Received prediction request. Column: {column}, Steps: {steps}, Time Column: {time_column}, Group Column: {group_column}")
-        
-        # Read and parse the uploaded file
-        contents = await file.read()
+    async with limiters["predict"]:
+        try:
+            print(f"Received prediction request. Column: {column}, Steps: {steps}, Time Column: {time_column}, Group Column: {group_column}")
         
-        # Try different encodings if needed
-        encodings = ['utf-8', 'latin1', 'windows-1252']
-        df = None
+            history = (history or "full").lower()
+            if history not in HISTORY_MODES:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid history mode '{history}'. Expected one of: {', '.join(HISTORY_MODES)}"
+                )
         
-        for encoding in encodings:
+            # Parse the uploaded file straight from the spooled upload; gzip, zstd
+            # and zip archives are decompressed on the fly. Different encodings are tried if needed.
             try:
-                contents_str = contents.decode(encoding)
-                df = pd.read_csv(io.StringIO(contents_str))
-                print(f"Successfully read file with {encoding} encoding")
-                break
-            except Exception as e:
-                print(f"Failed to read with {encoding}: {str(e)}")
-                continue
+                df, _ = await run_io(read_csv_upload, file.file, file.filename)
+            except UploadTooLargeError as e:
+                raise HTTPException(status_code=413, detail=str(e))
+            except ValueError as e:
+                # Unsupported or broken archive; the message says which
+                raise HTTPException(status_code=400, detail=str(e))
         
-        if df is None or df.empty:
-            error_msg = "Failed to read the uploaded file. Please check if it's a valid CSV file."
-            print(error_msg)
-            raise HTTPException(status_code=400, detail=error_msg)
+            if df is None or df.empty:
+                error_msg = "Failed to read the uploaded file. Please check if it's a valid CSV file."
+                print(error_msg)
+                raise HTTPException(status_code=400, detail=error_msg)
         
-        print(f"Original columns: {df.columns.tolist()}")
-        print(f"First few rows of data:\n{df.head().to_string()}")
+            print(f"Original columns: {df.columns.tolist()}")
+            print(f"First few rows of data:\n{df.head().to_string()}")
         
-        # Convert empty strings to None for optional parameters
-        time_column = time_column if time_column and time_column.lower() != 'auto' else None
-        group_column = group_column if group_column and group_column.lower() != 'auto' else None
+            # Convert empty strings to None for optional parameters
+            time_column = time_column if time_column and time_column.lower() != 'auto' else None
+            group_column = group_column if group_column and group_column.lower() != 'auto' else None
         
-        # Convert steps to integer
-        try:
-            steps = int(steps)
-        except (ValueError, TypeError):
-            steps = 5  # Default value
+            # Convert steps to integer
+            try:
+                steps = int(steps)
+            except (ValueError, TypeError):
+                steps = 5  # Default value
         
-        # Handle 'all' columns case
-        if column and column.lower() == 'all':
-            print("Predicting all numeric columns")
-            all_results = {}
+            # Handle 'all' columns case
+            if column and column.lower() == 'all':
+                print("Predicting all numeric columns")
             
-            # Get all numeric columns (excluding time and group columns)
-            numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-            if time_column and time_column in numeric_cols:
-                numeric_cols.remove(time_column)
-            if group_column and group_column in numeric_cols:
-                numeric_cols.remove(group_column)
+                # Get all numeric columns (excluding time and group columns)
+                numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+                if time_column and time_column in numeric_cols:
+                    numeric_cols.remove(time_column)
+                if group_column and group_column in numeric_cols:
+                    numeric_cols.remove(group_column)
                 
-            if not numeric_cols:
-                raise HTTPException(status_code=400, detail="No numeric columns found for prediction")
+                if not numeric_cols:
+                    raise HTTPException(status_code=400, detail="No numeric columns found for prediction")
                 
-            # Predict each column
-            for col in numeric_cols:
-                print(f"Predicting column: {col}")
-                try:
-                    result = predict_column(
-                        df=df,
-                        target_column=col,
-                        time_column=time_column,
-                        group_column=group_column,
-                        steps=steps
-                    )
-                    all_results[col] = clean_nans(result)
-                except Exception as e:
-                    print(f"Error predicting column {col}: {str(e)}")
-                    all_results[col] = {"error": f"Failed to predict: {str(e)}"}
-            
-            return all_results
+                # Predict all columns in one worker task so the dataframe is sent once
+                print(f"Predicting columns: {', '.join(numeric_cols)}")
+                body = await run_cpu(
+                    predict_columns_json,
+                    df,
+                    numeric_cols,
+                    time_column=time_column,
+                    group_column=group_column,
+                    steps=steps,
+                    history=history,
+                    history_points=history_points
+                )
+                return Response(content=body, media_type="application/json")
         
-        # Single column prediction (original behavior)
-        else:
-            # Check if the target column exists
-            if not column or column not in df.columns:
-                error_msg = f"Target column '{column}' not found in the uploaded file. Available columns: {', '.join(df.columns)}"
-                print(error_msg)
-                raise HTTPException(status_code=400, detail=error_msg)
+            # Single column prediction (original behavior)
+            else:
+                # Check if the target column exists
+                if not column or column not in df.columns:
+                    error_msg = f"Target column '{column}' not found in the uploaded file. Available columns: {', '.join(df.columns)}"
+                    print(error_msg)
+                    raise HTTPException(status_code=400, detail=error_msg)
             
-            print(f"Starting prediction with params - column: {column}, steps: {steps}, time_column: {time_column}, group_column: {group_column}")
+                print(f"Starting prediction with params - column: {column}, steps: {steps}, time_column: {time_column}, group_column: {group_column}")
             
-            # Call the prediction function
-            result = predict_column(
-                df=df,
-                target_column=column,
-                time_column=time_column,
-                group_column=group_column,
-                steps=steps
-            )
+                # Call the prediction function in the process pool
+                body = await run_cpu(
+                    predict_column_json,
+                    df=df,
+                    target_column=column,
+                    time_column=time_column,
+                    group_column=group_column,
+                    steps=steps,
+                    history=history,
+                    history_points=history_points
+                )
             
-            print("Prediction completed successfully")
-            return clean_nans(result)
+                print("Prediction completed successfully")
+                return Response(content=body, media_type="application/json")
         
-    except HTTPException as he:
-        print(f"HTTP Exception: {str(he.detail)}")
-        raise
-    except Exception as e:
-        error_msg = f"Error during prediction: {str(e)}"
-        print(error_msg)
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=error_msg)
-
-def clean_nans(obj):
-    """Helper function to clean NaN values for JSON serialization"""
-    if isinstance(obj, dict):
-        return {k: clean_nans(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [clean_nans(item) for item in obj]
-    elif pd.isna(obj):
-        return None
-    elif isinstance(obj, (np.integer, np.int64, np.int32, np.int16, np.int8)):
-        return int(obj)
-    elif isinstance(obj, (np.floating, np.float64, np.float32, np.float16)):
-        return float(obj) if not pd.isna(obj) else None
-    return obj
+        except HTTPException as he:
+            print(f"HTTP Exception: {str(he.detail)}")
+            raise
+        except Exception as e:
+            error_msg = f"Error during prediction: {str(e)}"
+            print(error_msg)
+            import traceback
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail=error_msg)
 
 # CORS middleware to allow frontend access
 app = FastAPI(title="DataGen API", version="1.0.0")
@@ -192,9 +242,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses (gzip, or zstd when available) for clients that accept it
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024")))
+
 # Include the router with an optional prefix
 app.include_router(router, prefix="/api")
 
+# Stop the I/O threads and CPU worker processes with the server
+@app.on_event("shutdown")
+def stop_executors():
+    shutdown_executors()
+
 # Add a simple root endpoint
 @app.get("/")
 async def root():
@@ -207,7 +265,11 @@ async def root():
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "version": "1.0.0"}
+    return {
+        "status": "healthy",
+        "version": "1.0.0",
+        "admission": {name: limiter.stats() for name, limiter in limiters.items()}
+    }
 
 if __name__ == "__main__":
     import uvicorn
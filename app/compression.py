@@ -0,0 +1,188 @@
+# compression.py
+
+import zlib
+from functools import partial
+from typing import Optional
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; gzip is always available
+    zstandard = None
+
+# Content types worth compressing; binary formats (images, zip) are already compressed
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+)
+
+
+def select_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick the response encoding from an Accept-Encoding header.
+
+    Prefers zstd (when the zstandard package is installed) over gzip and
+    honours q-values, including explicit refusals such as "gzip;q=0".
+    """
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+
+    def weight(name: str) -> float:
+        return accepted.get(name, accepted.get("*", 0.0))
+
+    candidates = (["zstd"] if zstandard is not None else []) + ["gzip"]
+    best = max(candidates, key=lambda name: weight(name))
+    return best if weight(best) > 0 else None
+
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        # Sync flush so every streamed chunk can be decoded as soon as it arrives
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+class _ZstdCompressor:
+    def __init__(self, level: int):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data) + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with gzip or zstd.
+
+    Single-message bodies smaller than `minimum_size` are sent as-is.
+    Streamed bodies (NDJSON) are compressed chunk by chunk as the
+    application produces them, each chunk flushed immediately. Bodies or
+    chunks of `offload_size` bytes or more are compressed on a worker
+    thread so the event loop keeps serving other requests meanwhile.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, zstd_level: int = 3,
+                 offload_size: int = 256 * 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+        self.levels = {"gzip": gzip_level, "zstd": zstd_level}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = select_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingResponder(send, encoding, self.levels[encoding], self.minimum_size, self.offload_size)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+    def __init__(self, send, encoding: str, level: int, minimum_size: int, offload_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.level = level
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+        self.start_message = None
+        self.mode = None  # None until decided, then "identity" or "compress"
+        self.compressor = None
+
+    def _compressible(self) -> bool:
+        headers = Headers(raw=self.start_message["headers"])
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES) or "+json" in content_type
+
+    def _start_compressing(self) -> MutableHeaders:
+        self.mode = "compress"
+        self.compressor = (_ZstdCompressor if self.encoding == "zstd" else _GzipCompressor)(self.level)
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if "content-length" in headers:
+            del headers["Content-Length"]
+        return headers
+
+    def _compress_sync(self, body: bytes, finish: bool) -> bytes:
+        chunk = self.compressor.compress(body) if body else b""
+        if finish:
+            chunk += self.compressor.finish()
+        return chunk
+
+    async def _compress(self, body: bytes, finish: bool) -> bytes:
+        # Small chunks are cheaper to compress inline than to hand to a thread
+        if len(body) < self.offload_size:
+            return self._compress_sync(body, finish)
+        return await anyio.to_thread.run_sync(partial(self._compress_sync, body, finish))
+
+    async def send(self, message):
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            self.start_message = message
+            return
+
+        if message_type != "http.response.body" or self.mode == "identity":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.mode == "compress":
+            chunk = await self._compress(body, finish=not more_body)
+            await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+            return
+
+        # Undecided: this is the first body chunk
+        if not self._compressible() or (not more_body and len(body) < self.minimum_size):
+            self.mode = "identity"
+            await self._send(self.start_message)
+            await self._send(message)
+            return
+
+        headers = self._start_compressing()
+        if not more_body:
+            # Whole body in hand: compress in one go with an exact Content-Length
+            compressed = await self._compress(body, finish=True)
+            headers["Content-Length"] = str(len(compressed))
+            await self._send(self.start_message)
+            await self._send({"type": "http.response.body", "body": compressed})
+            return
+
+        # Streamed body: its total size is unknown, so compress from the first chunk
+        # on; each chunk is sync-flushed and reaches the client without waiting for more
+        chunk = await self._compress(body, finish=False)
+        await self._send(self.start_message)
+        await self._send({"type": "http.response.body", "body": chunk, "more_body": True})
@@ -0,0 +1,163 @@
+# concurrency.py
+
+import os
+import signal
+import multiprocessing
+import asyncio
+import functools
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+# Threads for blocking I/O (LLM calls, reading uploads)
+IO_THREADS = int(os.getenv("IO_THREADS", "64"))
+# Processes for CPU-bound work (model fits, upsampling); 0 runs it on the I/O threads instead
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(os.cpu_count() or 1)))
+# How long a request may wait for an admission slot before it is rejected
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+
+io_executor = ThreadPoolExecutor(max_workers=IO_THREADS, thread_name_prefix="io")
+_cpu_executor: Optional[Executor] = None
+_cpu_lock = threading.Lock()
+
+
+def _init_cpu_worker() -> None:
+    # Forked workers inherit the server's signal handlers; restore the defaults so
+    # SIGTERM stops them and Ctrl-C is left to the parent.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def get_cpu_executor() -> Executor:
+    """Return the process pool for CPU-bound stages, creating it on first use."""
+    global _cpu_executor
+    with _cpu_lock:
+        if _cpu_executor is None:
+            if CPU_WORKERS > 0:
+                # Not fork: the pool starts while I/O threads may hold locks a forked child would inherit
+                _cpu_executor = ProcessPoolExecutor(
+                    max_workers=CPU_WORKERS,
+                    mp_context=multiprocessing.get_context("forkserver"),
+                    initializer=_init_cpu_worker
+                )
+            else:
+                _cpu_executor = io_executor
+        return _cpu_executor
+
+
+def shutdown_executors() -> None:
+    """Stop the worker pools; called when the application shuts down."""
+    global _cpu_executor
+    with _cpu_lock:
+        if _cpu_executor is not None and _cpu_executor is not io_executor:
+            _cpu_executor.shutdown(wait=True, cancel_futures=True)
+        _cpu_executor = None
+    io_executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_io(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run blocking I/O on the thread pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def run_cpu(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a CPU-bound function (must be picklable, i.e. module-level) on the process pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_cpu_executor(), functools.partial(fn, *args, **kwargs))
+
+
+class AdmissionLimiter:
+    """
+    Per-endpoint admission control.
+
+    At most `max_concurrent` requests run at once and at most `max_queue`
+    wait for a slot. Requests arriving when the queue is full are rejected
+    immediately with 429; requests that wait longer than `queue_timeout`
+    are rejected with 503. Both carry a Retry-After header.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    def _reject(self, status_code: int, reason: str) -> HTTPException:
+        self.rejected += 1
+        return HTTPException(
+            status_code=status_code,
+            detail=f"{self.name} is saturated ({reason}); retry shortly",
+            headers={"Retry-After": "1"}
+        )
+
+    async def acquire(self) -> None:
+        if self._semaphore.locked() or self.waiting:
+            if self.waiting >= self.max_queue:
+                raise self._reject(429, f"{self.waiting} requests queued")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise self._reject(503, f"no slot within {self.queue_timeout:.0f}s")
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "queued": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected
+        }
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    Streaming response that releases an admission slot when it is done.
+
+    The slot is released however the response ends, including when the
+    client disconnects before the body starts and the body iterator never
+    runs.
+    """
+
+    def __init__(self, content, limiter: AdmissionLimiter, **kwargs):
+        super().__init__(content, **kwargs)
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.limiter.release()
+
+
+def endpoint_limiter(name: str, max_concurrent: int, max_queue: int) -> AdmissionLimiter:
+    """Build a limiter whose limits can be overridden with LIMIT_<NAME>_CONCURRENCY / LIMIT_<NAME>_QUEUE."""
+    prefix = f"LIMIT_{name.upper()}"
+    return AdmissionLimiter(
+        name,
+        max_concurrent=int(os.getenv(f"{prefix}_CONCURRENCY", str(max_concurrent))),
+        max_queue=int(os.getenv(f"{prefix}_QUEUE", str(max_queue)))
+    )
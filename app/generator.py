@@ -1,14 +1,26 @@
 import os
+import json
+import hashlib
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import OpenAI, APIConnectionError
 from prompts import build_prompt, build_time_series_prompt  # Import both prompt builders
+from outbound import get_provider
 
 load_dotenv()
 
-# Initialize OpenRouter-based OpenAI client
+MODEL = "mistralai/mistral-7b-instruct"
+
+# Shared outbound settings (pool, concurrency limit, retries, circuit breaker)
+provider = get_provider("openrouter")
+
+# Initialize OpenRouter-based OpenAI client on the provider's pooled connection.
+# Retries are handled by the provider so the SDK's own retries are disabled.
 client = OpenAI(
     api_key=os.getenv("OPENROUTER_API_KEY"),
-    base_url="https://openrouter.ai/api/v1"
+    base_url=os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"),
+    http_client=provider.client,
+    timeout=provider.timeout,
+    max_retries=0
 )
 
 def generate_csv_data(user_prompt, dataset_type="tabular"):
@@ -17,14 +29,24 @@ def generate_csv_data(user_prompt, dataset_type="tabular"):
     else:
         full_prompt = build_prompt(user_prompt)
 
-    # LLM API call to OpenRouter
-    chat_completion = client.chat.completions.create(
-        model="mistralai/mistral-7b-instruct",
-        messages=[
+    request = {
+        "model": MODEL,
+        "messages": [
             {"role": "system", "content": "You generate fake CSV datasets."},
             {"role": "user", "content": full_prompt}
         ],
-        temperature=0.7
+        "temperature": 0.7
+    }
+
+    # Identical requests already in flight share one upstream call
+    key = hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
+
+    # LLM API call to OpenRouter
+    chat_completion = provider.call(
+        client.chat.completions.create,
+        key=key,
+        retry_on=(APIConnectionError,),
+        **request
     )
 
     return chat_completion.choices[0].message.content
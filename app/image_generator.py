@@ -1,15 +1,19 @@
 import os
+import json
 import time
 import uuid
-import httpx
+import threading
+import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
 from PIL import Image
 from io import BytesIO
+from outbound import get_provider
 
 load_dotenv()
 
 IMAGE_OUTPUT_DIR = "generated_images"
+STABLE_HORDE_URL = os.getenv("STABLE_HORDE_BASE_URL", "https://stablehorde.net/api/v2")
 API_KEY = os.getenv("STABLE_HORDE_KEY", "")  # Optional, works without
 
 HEADERS = {
@@ -17,60 +21,189 @@ HEADERS = {
     "Client-Agent": "data-gen-tool/1.0"
 }
 
-def generate_images_from_prompt(prompt, count=5):
-    os.makedirs(IMAGE_OUTPUT_DIR, exist_ok=True)
-    metadata = []
+POLL_INTERVAL = float(os.getenv("STABLE_HORDE_POLL_INTERVAL", "2"))  # seconds between status checks
+POLL_DEADLINE = float(os.getenv("STABLE_HORDE_POLL_DEADLINE", "600"))  # give up on a generation after this long
 
-    for i in range(count):
-        # Step 1: Submit generation request
-        print(f"Requesting image {i+1}/{count}...")
+# Shared outbound settings (pool, concurrency limit, retries, circuit breaker)
+provider = get_provider("stable_horde")
 
-        payload = {
-            "prompt": prompt,
-            "params": {
-                "n": 1,
-                "width": 512,
-                "height": 512,
-                "steps": 25,
-                "sampler_name": "k_euler"
-            },
-            "models": ["stable_diffusion"],
-            "r2": True
-        }
-
-        submit = httpx.post(
-            "https://stablehorde.net/api/v2/generate/async",
-            json=payload,
+MANIFEST_NAME = "manifest.jsonl"
+HASH_DISTANCE_THRESHOLD = int(os.getenv("IMAGE_HASH_DISTANCE", "5"))  # max differing bits for a duplicate
+_manifest_lock = threading.Lock()
+
+def average_hash(image, size=8):
+    """64-bit average hash: pixels of a size x size grayscale thumbnail compared to their mean."""
+    pixels = np.asarray(image.convert("L").resize((size, size), Image.LANCZOS), dtype=np.float32)
+    bits = (pixels > pixels.mean()).ravel()
+    return int(np.packbits(bits).view(">u8")[0])
+
+def difference_hash(image, size=8):
+    """64-bit difference hash: horizontal brightness gradients of a (size + 1) x size thumbnail."""
+    pixels = np.asarray(image.convert("L").resize((size + 1, size), Image.LANCZOS), dtype=np.float32)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int(np.packbits(bits).view(">u8")[0])
+
+class HashIndex:
+    """In-memory index of image hashes with vectorized Hamming-distance lookup."""
+
+    def __init__(self, threshold=HASH_DISTANCE_THRESHOLD):
+        self.threshold = threshold
+        self.ahashes = np.empty(0, dtype=np.uint64)
+        self.dhashes = np.empty(0, dtype=np.uint64)
+
+    def add(self, ahash, dhash):
+        self.ahashes = np.append(self.ahashes, np.uint64(ahash))
+        self.dhashes = np.append(self.dhashes, np.uint64(dhash))
+
+    def is_duplicate(self, ahash, dhash):
+        if len(self.ahashes) == 0:
+            return False
+        a_dist = np.bitwise_count(self.ahashes ^ np.uint64(ahash))
+        d_dist = np.bitwise_count(self.dhashes ^ np.uint64(dhash))
+        return bool(np.any((a_dist <= self.threshold) & (d_dist <= self.threshold)))
+
+def load_manifest(output_dir):
+    """Read run-completion markers and the image records whose file is still on disk."""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Partially written last line from an interrupted run
+            if record.get("done") or os.path.exists(os.path.join(output_dir, record.get("filename", ""))):
+                records.append(record)
+    return records
+
+def unfinished_run(records, prompt):
+    """Return the id of the latest run for `prompt` if it was interrupted before finishing."""
+    latest, finished = None, set()
+    for record in records:
+        if record.get("prompt") != prompt or "run_id" not in record:
+            continue
+        if record.get("done"):
+            finished.add(record["run_id"])
+        else:
+            latest = record["run_id"]
+    return latest if latest not in finished else None
+
+def append_manifest(output_dir, record):
+    """Append one record and flush it to disk so a crash cannot lose it."""
+    with _manifest_lock:
+        with open(os.path.join(output_dir, MANIFEST_NAME), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+def request_image(prompt):
+    """Submit one generation to Stable Horde, wait for it and return the image."""
+    payload = {
+        "prompt": prompt,
+        "params": {
+            "n": 1,
+            "width": 512,
+            "height": 512,
+            "steps": 25,
+            "sampler_name": "k_euler"
+        },
+        "models": ["stable_diffusion"],
+        "r2": True
+    }
+
+    submit = provider.request(
+        "POST",
+        f"{STABLE_HORDE_URL}/generate/async",
+        json=payload,
+        headers=HEADERS
+    )
+    if submit.status_code != 202:
+        raise Exception(f"Request failed: {submit.text}")
+
+    generation_id = submit.json()["id"]
+
+    # Poll until image is ready
+    deadline = time.monotonic() + POLL_DEADLINE
+    while True:
+        time.sleep(POLL_INTERVAL)
+        status = provider.request(
+            "GET",
+            f"{STABLE_HORDE_URL}/generate/status/{generation_id}",
             headers=HEADERS
-        )
-        if submit.status_code != 202:
-            raise Exception(f"Request failed: {submit.text}")
-
-        generation_id = submit.json()["id"]
-
-        # Step 2: Poll until image is ready
-        while True:
-            time.sleep(2)
-            status = httpx.get(
-                f"https://stablehorde.net/api/v2/generate/status/{generation_id}",
-                headers=HEADERS
-            ).json()
-            if status.get("done", False):
-                break
-
-        # Step 3: Download and convert to PNG
-        image_url = status["generations"][0]["img"]
-        response = httpx.get(image_url, timeout=180)
-        image = Image.open(BytesIO(response.content)).convert("RGB")
+        ).json()
+        if status.get("done", False):
+            break
+        if time.monotonic() > deadline:
+            raise Exception(f"Generation {generation_id} did not finish within {POLL_DEADLINE:.0f}s")
+
+    # Download and convert to RGB
+    image_url = status["generations"][0]["img"]
+    response = provider.request("GET", image_url, timeout=180)
+    return Image.open(BytesIO(response.content)).convert("RGB")
+
+def generate_images_from_prompt(prompt, count=5, resume=True, max_attempts=None):
+    """
+    Generate `count` unique images for a prompt into IMAGE_OUTPUT_DIR.
+
+    Every saved image is appended to manifest.jsonl as it lands, tagged
+    with the id of its run, and a marker is appended when the run ends.
+    When `resume` is true, a run for the same prompt that was interrupted
+    picks up where it stopped; otherwise (or once the run finished) a new
+    run starts. Near-identical images (perceptual hashes within
+    HASH_DISTANCE_THRESHOLD bits of an image of the same run) are discarded
+    and regenerated, up to `max_attempts` requests in total (default
+    2 * count).
+    """
+    os.makedirs(IMAGE_OUTPUT_DIR, exist_ok=True)
+
+    existing = load_manifest(IMAGE_OUTPUT_DIR)
+    run_id = unfinished_run(existing, prompt) if resume else None
+    run_records = [r for r in existing if run_id is not None and r.get("run_id") == run_id and not r.get("done")]
+    run_id = run_id or uuid.uuid4().hex
+
+    index = HashIndex()
+    for record in run_records:
+        index.add(int(record["ahash"], 16), int(record["dhash"], 16))
+
+    metadata = [{"filename": r["filename"], "label": r["label"]} for r in run_records][:count]
+    if metadata:
+        print(f"Resuming: {len(metadata)}/{count} images already generated")
+
+    max_attempts = max_attempts if max_attempts is not None else 2 * count
+    attempts = 0
+    while len(metadata) < count and attempts < max_attempts:
+        attempts += 1
+        print(f"Requesting image {len(metadata) + 1}/{count}...")
+        image = request_image(prompt)
+
+        ahash, dhash = average_hash(image), difference_hash(image)
+        if index.is_duplicate(ahash, dhash):
+            print("Discarding near-duplicate image")
+            continue
 
         filename = f"{uuid.uuid4().hex}.png"
         file_path = os.path.join(IMAGE_OUTPUT_DIR, filename)
         image.save(file_path, "PNG")
 
+        index.add(ahash, dhash)
+        append_manifest(IMAGE_OUTPUT_DIR, {
+            "run_id": run_id,
+            "filename": filename,
+            "label": prompt,
+            "prompt": prompt,
+            "ahash": f"{ahash:016x}",
+            "dhash": f"{dhash:016x}"
+        })
         metadata.append({"filename": filename, "label": prompt})
 
+    if len(metadata) < count:
+        print(f"Stopped after {attempts} requests with {len(metadata)}/{count} unique images")
+    append_manifest(IMAGE_OUTPUT_DIR, {"run_id": run_id, "prompt": prompt, "done": True})
+
     # Save labels CSV
-    df = pd.DataFrame(metadata)
+    df = pd.DataFrame(metadata, columns=["filename", "label"])
     df.to_csv(os.path.join(IMAGE_OUTPUT_DIR, "labels.csv"), index=False)
 
     return IMAGE_OUTPUT_DIR
@@ -1,6 +1,9 @@
+import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from api import router as api_router
+from compression import CompressionMiddleware
+from concurrency import shutdown_executors
 
 # Create FastAPI application
 app = FastAPI(
@@ -18,9 +21,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses (gzip, or zstd when available) for clients that accept it
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024")))
+
 # Include the API router
 app.include_router(api_router, prefix="/api")
 
+# Stop the I/O threads and CPU worker processes with the server
+@app.on_event("shutdown")
+def stop_executors():
+    shutdown_executors()
+
 @app.get("/")
 async def root():
     return {
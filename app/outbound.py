@@ -0,0 +1,293 @@
+# outbound.py
+
+import os
+import time
+import random
+import threading
+import httpx
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Upstream status codes worth retrying (throttling and transient server errors)
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a provider's circuit breaker is rejecting calls."""
+
+
+def _env_number(name: str, default, cast=float):
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        return default
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None)
+    return status
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    """Return the Retry-After delay (seconds) sent with a throttling response, if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After `failure_threshold` failures in a row the breaker opens and rejects
+    calls for `reset_timeout` seconds, then lets a single trial call through
+    (half-open). A success closes it again, a failure re-opens it, and a
+    neutral outcome (a client error) just frees the trial slot.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls: while a call for `key` is running,
+    other callers with the same key wait for it and share its result.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+class Provider:
+    """
+    Shared outbound-request settings and state for one upstream provider:
+    a pooled httpx client, a concurrency semaphore, timeouts, jittered
+    exponential backoff, a circuit breaker and in-flight request coalescing.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int = 4,
+        timeout: float = 60.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 20.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.client = httpx.Client(
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 10.0)),
+            limits=httpx.Limits(
+                max_connections=max_concurrency * 2,
+                max_keepalive_connections=max_concurrency,
+            ),
+        )
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._singleflight = SingleFlight()
+
+    def is_retryable(self, exc: BaseException, retry_on: Tuple[type, ...] = ()) -> bool:
+        if isinstance(exc, (httpx.TransportError, TimeoutError, ConnectionError)):
+            return True
+        if retry_on and isinstance(exc, retry_on):
+            return True
+        return _status_code(exc) in RETRYABLE_STATUS_CODES
+
+    def backoff(self, attempt: int, exc: Optional[BaseException] = None) -> float:
+        """Full-jitter exponential backoff, honouring Retry-After when sent."""
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+        retry_after = _retry_after(exc) if exc is not None else None
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_cap))
+        return delay
+
+    def call(
+        self,
+        fn: Callable[..., Any],
+        *args,
+        key: Optional[str] = None,
+        retry_on: Tuple[type, ...] = (),
+        **kwargs,
+    ) -> Any:
+        """
+        Run `fn(*args, **kwargs)` against this provider.
+
+        Args:
+            fn: Callable performing the upstream request
+            key: Optional coalescing key; concurrent calls with the same key
+                share a single upstream call
+            retry_on: Extra exception types to treat as transient
+
+        Returns:
+            Whatever `fn` returns
+        """
+        if key is None:
+            return self._call_with_retries(fn, args, kwargs, retry_on)
+        return self._singleflight.do(
+            key, lambda: self._call_with_retries(fn, args, kwargs, retry_on)
+        )
+
+    def _call_with_retries(self, fn, args, kwargs, retry_on):
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError(
+                    f"Provider '{self.name}' is temporarily unavailable (circuit open)"
+                )
+            try:
+                with self._semaphore:
+                    result = fn(*args, **kwargs)
+            except Exception as e:
+                if not self.is_retryable(e, retry_on):
+                    # Client-side errors say nothing about upstream health
+                    self.breaker.release_trial()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt, e)
+                print(f"[{self.name}] attempt {attempt + 1} failed ({e}); retrying in {delay:.2f}s")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Send an HTTP request through the pooled client with retries.
+
+        Throttling and transient server responses are retried; any other
+        response is returned to the caller as-is.
+        """
+        def send():
+            response = self.client.request(method, url, **kwargs)
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                response.raise_for_status()
+            return response
+
+        return self.call(send)
+
+
+_providers: Dict[str, Provider] = {}
+_providers_lock = threading.Lock()
+
+# Defaults per provider; each value can be overridden with an environment
+# variable such as OPENROUTER_MAX_CONCURRENCY or STABLE_HORDE_TIMEOUT.
+PROVIDER_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "openrouter": {"max_concurrency": 8, "timeout": 60.0},
+    "stable_horde": {"max_concurrency": 4, "timeout": 30.0},
+}
+
+
+def get_provider(name: str) -> Provider:
+    """Return the shared Provider for `name`, creating it on first use."""
+    with _providers_lock:
+        provider = _providers.get(name)
+        if provider is None:
+            defaults = PROVIDER_DEFAULTS.get(name, {})
+            prefix = name.upper()
+            provider = Provider(
+                name,
+                max_concurrency=_env_number(f"{prefix}_MAX_CONCURRENCY", defaults.get("max_concurrency", 4), int),
+                timeout=_env_number(f"{prefix}_TIMEOUT", defaults.get("timeout", 60.0)),
+                max_retries=_env_number(f"{prefix}_MAX_RETRIES", defaults.get("max_retries", 3), int),
+                backoff_base=_env_number(f"{prefix}_BACKOFF_BASE", defaults.get("backoff_base", 0.5)),
+                backoff_cap=_env_number(f"{prefix}_BACKOFF_CAP", defaults.get("backoff_cap", 20.0)),
+                failure_threshold=_env_number(f"{prefix}_FAILURE_THRESHOLD", defaults.get("failure_threshold", 5), int),
+                reset_timeout=_env_number(f"{prefix}_RESET_TIMEOUT", defaults.get("reset_timeout", 30.0)),
+            )
+            _providers[name] = provider
+        return provider
@@ -1,9 +1,14 @@
 # predictor.py
 
+import json
 import pandas as pd
 import numpy as np
 from sklearn.linear_model import LinearRegression
 from typing import List, Optional, Dict, Any, Union
+from timeaxis import parse_datetime_column, infer_time_frequency, epoch_seconds, format_datetimes
+
+# Ways of shaping the original rows returned alongside the forecasts
+HISTORY_MODES = ('full', 'none', 'tail', 'lttb')
 
 def detect_time_column(df: pd.DataFrame, target_column: str) -> Optional[str]:
     """
@@ -31,6 +36,13 @@ def detect_time_column(df: pd.DataFrame, target_column: str) -> Optional[str]:
         if any(term in col.lower() for term in time_patterns):
             return col
     
+    # Then for text columns holding dates
+    for col in df.select_dtypes(exclude=['number']).columns:
+        if col.lower() == target_column.lower():
+            continue
+        if parse_datetime_column(df[col]) is not None:
+            return col
+    
     # If no obvious time column, look for numeric columns that could be years
     for col in df.select_dtypes(include=['number']).columns:
         if col.lower() == target_column.lower():
@@ -75,12 +87,112 @@ def detect_group_column(df: pd.DataFrame, target_column: str, time_column: Optio
     
     return None
 
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Select points with Largest-Triangle-Three-Buckets downsampling.
+    
+    Args:
+        x: Sorted x values (e.g. time)
+        y: y values
+        n_out: Number of points to keep
+        
+    Returns:
+        Sorted positional indices of the selected points
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1][:max(n_out, 0)], dtype=int)
+    
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    
+    # Interior points split into n_out - 2 buckets; first and last points are always kept
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    counts = np.diff(edges)
+    avg_x = np.append(np.add.reduceat(x[:-1], edges[:-1]) / counts, x[-1])
+    avg_y = np.append(np.add.reduceat(y[:-1], edges[:-1]) / counts, y[-1])
+    
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        # Triangle area between the last selected point, each candidate and the next bucket's mean
+        area = np.abs((ax - avg_x[i + 1]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (avg_y[i + 1] - ay))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    
+    return selected
+
+def shape_history(
+    combined: pd.DataFrame,
+    target_column: str,
+    time_column: str,
+    group_column: Optional[str] = None,
+    history: str = 'full',
+    history_points: int = 500
+) -> pd.DataFrame:
+    """
+    Reduce the original rows of a prediction result for charting.
+    
+    Args:
+        combined: Sorted original and predicted rows (with a 'source' column)
+        target_column: Predicted column
+        time_column: Time column
+        group_column: Optional group column
+        history: 'full' keeps every row, 'none' returns predictions only,
+            'tail' keeps the last `history_points` rows per group and
+            'lttb' downsamples each group to `history_points` rows
+        history_points: Number of history rows per group for 'tail' and 'lttb'
+        
+    Returns:
+        DataFrame with the shaped history followed by the predictions, in the original order
+    """
+    if history not in HISTORY_MODES:
+        raise ValueError(f"Unknown history mode '{history}'. Expected one of: {', '.join(HISTORY_MODES)}")
+    if history == 'full':
+        return combined
+    
+    is_history = (combined['source'] == 'original').to_numpy()
+    positions = np.flatnonzero(is_history)
+    
+    if history == 'none' or len(positions) == 0:
+        return combined[~is_history]
+    
+    hist = combined.iloc[positions]
+    if group_column and group_column in hist.columns:
+        groups = hist.groupby(group_column, sort=False, observed=True).indices.values()
+    else:
+        groups = [np.arange(len(hist))]
+    
+    if pd.api.types.is_datetime64_any_dtype(hist[time_column]):
+        x = epoch_seconds(hist[time_column]).astype(float)
+    else:
+        x = pd.to_numeric(hist[time_column], errors='coerce').to_numpy(dtype=float)
+    y = pd.to_numeric(hist[target_column], errors='coerce').to_numpy(dtype=float)
+    
+    keep = []
+    for idx in groups:
+        if history == 'tail':
+            keep.append(idx[-history_points:])
+        else:
+            keep.append(idx[lttb_indices(x[idx], y[idx], history_points)])
+    
+    mask = ~is_history
+    mask[positions[np.concatenate(keep)]] = True
+    return combined[mask]
+
 def predict_time_series(
     df: pd.DataFrame, 
     target_column: str, 
     time_column: str, 
     group_column: Optional[str] = None, 
-    steps: int = 5
+    steps: int = 5,
+    history: str = 'full',
+    history_points: int = 500
 ) -> pd.DataFrame:
     """
     Perform time series prediction for the target column.
@@ -91,6 +203,8 @@ def predict_time_series(
         time_column: Time column for prediction
         group_column: Optional column to group by
         steps: Number of future time steps to predict
+        history: How to shape the original rows (see `shape_history`)
+        history_points: History rows per group for 'tail' and 'lttb'
         
     Returns:
         DataFrame with original and predicted values
@@ -101,8 +215,20 @@ def predict_time_series(
     # Convert target and time columns to appropriate types
     df[target_column] = pd.to_numeric(df[target_column], errors='coerce')
     
-    # Convert time column to numeric first
-    df[time_column] = pd.to_numeric(df[time_column], errors='coerce')
+    # Dates are parsed once with an inferred format; anything else is treated as numeric
+    parsed_times = parse_datetime_column(df[time_column])
+    is_datetime = parsed_times is not None
+    if is_datetime:
+        df[time_column] = parsed_times
+    else:
+        numeric_times = pd.to_numeric(df[time_column], errors='coerce')
+        if numeric_times.isna().all() and df[time_column].notna().any():
+            sample = ', '.join(df[time_column].dropna().astype(str).unique()[:3])
+            raise ValueError(
+                f"Unrecognised date format in time column '{time_column}' (e.g. {sample}); "
+                "use ISO dates such as 2023-01-31 or numeric periods"
+            )
+        df[time_column] = numeric_times
     
     # If we have a group column, ensure it's treated as a string category
     if group_column and group_column in df.columns:
@@ -121,59 +247,72 @@ def predict_time_series(
     sort_columns = [group_column, time_column] if group_column else [time_column]
     df = df.sort_values(by=sort_columns)
     
+    # Calendar frequency for date axes, inferred once for all groups
+    frequency = infer_time_frequency(df[time_column]) if is_datetime else None
+    
     # Function to make predictions for a single group
-    def predict_group(group: pd.DataFrame) -> pd.DataFrame:
+    def predict_group(group: pd.DataFrame, group_value: Optional[str] = None) -> pd.DataFrame:
         if len(group) < 2:
             return pd.DataFrame()  # Skip groups with insufficient data
             
-        # Prepare time index
-        time_vals = pd.to_numeric(group[time_column])
-        X = time_vals.values.reshape(-1, 1)
+        if is_datetime:
+            # Fit on an int64 epoch-seconds axis
+            times = group[time_column]
+            X = epoch_seconds(times).reshape(-1, 1)
+            last_time = times.max()
+            if frequency is not None:
+                future_times = pd.date_range(start=last_time + frequency, periods=steps, freq=frequency)
+            else:
+                future_times = pd.DatetimeIndex([last_time] * steps)
+            future_X = epoch_seconds(future_times).reshape(-1, 1)
+        else:
+            # Prepare time index
+            time_vals = pd.to_numeric(group[time_column])
+            X = time_vals.values.reshape(-1, 1)
+            
+            # Create future time points
+            last_time = time_vals.max()
+            time_step = 1  # Default step size
+            
+            # Calculate time step from data if possible
+            if len(time_vals) > 1:
+                time_diffs = np.diff(time_vals.unique())
+                if len(time_diffs) > 0:
+                    time_step = float(np.median(time_diffs))
+            
+            future_times = last_time + time_step * np.arange(1, steps + 1, dtype=float)
+            future_X = future_times.reshape(-1, 1)
+        
         y = group[target_column].values
         
         # Train model
         model = LinearRegression()
         model.fit(X, y)
         
-        # Create future time points
-        last_time = time_vals.max()
-        time_step = 1  # Default step size
-        
-        # Calculate time step from data if possible
-        if len(time_vals) > 1:
-            time_diffs = np.diff(time_vals.unique())
-            if len(time_diffs) > 0:
-                time_step = float(np.median(time_diffs))
-        
-        future_times = np.array([last_time + (i + 1) * time_step for i in range(steps)])
-        
         # Make predictions
-        future_predictions = model.predict(future_times.reshape(-1, 1))
+        future_predictions = model.predict(future_X)
         
         # Create prediction rows
-        pred_rows = []
-        for i, (time_val, pred_val) in enumerate(zip(future_times, future_predictions)):
-            pred_row = {
-                time_column: float(time_val),
-                target_column: float(pred_val),
-                'source': 'predicted'
-            }
-            
-            # Copy group values if group column exists
-            if group_column is not None and group_column in group.columns:
-                # Get the first group value as a string
-                group_value = str(group[group_column].iloc[0])
-                pred_row[group_column] = group_value
-                
-            pred_rows.append(pred_row)
+        pred_rows = pd.DataFrame({
+            time_column: future_times,
+            target_column: future_predictions.astype(float),
+            'source': 'predicted'
+        })
+        
+        # Copy group values if group column exists
+        if group_value is not None:
+            pred_rows[group_column] = group_value
         
-        return pd.DataFrame(pred_rows)
+        return pred_rows
     
     # Apply prediction to each group or the entire dataset
     if group_column and group_column in df.columns:
         # Convert group column to string for consistent grouping
         df[group_column] = df[group_column].astype(str)
-        predictions = df.groupby(group_column, group_keys=False).apply(predict_group).reset_index(drop=True)
+        predictions = pd.concat(
+            [predict_group(group, str(value)) for value, group in df.groupby(group_column, sort=False)],
+            ignore_index=True
+        )
     else:
         predictions = predict_group(df)
     
@@ -193,16 +332,22 @@ def predict_time_series(
     sort_cols = [group_column, time_column] if group_column else [time_column]
     combined = combined.sort_values(by=sort_cols)
     
-    # Convert all columns to native Python types for JSON serialization
+    # Shape the history before the per-value conversions below
+    combined = shape_history(combined, target_column, time_column, group_column, history, history_points)
+    
+    # Return dates as ISO strings (date only when every timestamp is midnight)
+    if is_datetime:
+        combined[time_column] = format_datetimes(combined[time_column])
+    
+    # Categories are returned as plain strings (to_dict/to_json box numbers natively)
     for col in combined.columns:
-        if pd.api.types.is_categorical_dtype(combined[col]):
+        if isinstance(combined[col].dtype, pd.CategoricalDtype):
             combined[col] = combined[col].astype(str)
-        elif pd.api.types.is_numeric_dtype(combined[col]):
-            combined[col] = combined[col].apply(lambda x: x.item() if hasattr(x, 'item') else x)
     
     # Clean up any remaining NaN values
     combined = combined.where(pd.notnull(combined), None)
     
+    combined.attrs['time_frequency'] = getattr(frequency, 'freqstr', None)
     return combined
 
 def predict_column(
@@ -210,7 +355,10 @@ def predict_column(
     target_column: str, 
     time_column: Optional[str] = None,
     group_column: Optional[str] = None,
-    steps: int = 5
+    steps: int = 5,
+    history: str = 'full',
+    history_points: int = 500,
+    as_frame: bool = False
 ) -> Dict[str, Any]:
     """
     Main prediction function with automatic column detection.
@@ -221,6 +369,9 @@ def predict_column(
         time_column: Optional time column (auto-detected if None)
         group_column: Optional group column (auto-detected if None)
         steps: Number of future time steps to predict
+        history: How to shape the original rows (see `shape_history`)
+        history_points: History rows per group for 'tail' and 'lttb'
+        as_frame: Return the predictions as a DataFrame instead of a list of records
         
     Returns:
         Dictionary with prediction results and metadata
@@ -245,17 +396,22 @@ def predict_column(
             target_column=target_column,
             time_column=time_column,
             group_column=group_column,
-            steps=steps
+            steps=steps,
+            history=history,
+            history_points=history_points
         )
         
         # Convert to dictionary for JSON serialization
         result_dict = {
             'success': True,
-            'predictions': result_df.to_dict(orient='records'),
+            'predictions': result_df if as_frame else result_df.to_dict(orient='records'),
             'target_column': target_column,
             'time_column': time_column,
             'group_column': group_column,
             'steps': steps,
+            'time_frequency': result_df.attrs.get('time_frequency'),
+            'history': history,
+            'history_points': history_points,
             'prediction_type': 'time_series',
             'prediction_method': 'linear_regression'
         }
@@ -271,3 +427,38 @@ def predict_column(
             'group_column': group_column,
             'steps': steps
         }
+
+def _to_json(result: Dict[str, Any]) -> bytes:
+    """Serialize a `predict_column` result; the prediction rows are written by pandas' C JSON encoder."""
+    predictions = result.pop('predictions', None)
+    meta = json.dumps(result)
+    if predictions is None:
+        return meta.encode('utf-8')
+    rows = predictions.to_json(orient='records', double_precision=15)
+    return ('{"predictions": ' + rows + ', ' + meta[1:]).encode('utf-8')
+
+def predict_column_json(*args, **kwargs) -> bytes:
+    """
+    `predict_column` serialized to JSON bytes (NaN and infinity become null).
+    
+    Module-level so it can be sent to a process pool; the (large) response
+    body is built in the worker rather than on the event loop.
+    """
+    return _to_json(predict_column(*args, as_frame=True, **kwargs))
+
+def predict_columns_json(df: pd.DataFrame, target_columns: List[str], **kwargs) -> bytes:
+    """
+    Predict several columns in one task and serialize {column: result} to JSON bytes.
+    
+    The dataframe is sent to the worker once for all columns; a column that
+    fails gets an error entry instead of failing the others.
+    """
+    parts = []
+    for col in target_columns:
+        try:
+            body = _to_json(predict_column(df, col, as_frame=True, **kwargs))
+        except Exception as e:
+            print(f"Error predicting column {col}: {str(e)}")
+            body = json.dumps({'error': f'Failed to predict: {str(e)}'}).encode('utf-8')
+        parts.append(json.dumps(col).encode('utf-8') + b': ' + body)
+    return b'{' + b', '.join(parts) + b'}'
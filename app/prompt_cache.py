@@ -0,0 +1,178 @@
+# prompt_cache.py
+
+import os
+import re
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Words that carry no meaning for which dataset is wanted
+STOPWORDS = {
+    'a', 'an', 'the', 'of', 'for', 'with', 'and', 'or', 'in', 'on', 'to', 'about', 'by', 'from',
+    'data', 'dataset', 'datasets', 'table', 'csv', 'rows', 'row', 'records', 'record',
+    'generate', 'create', 'make', 'give', 'me', 'i', 'want', 'need', 'please', 'some',
+    'sample', 'fake', 'synthetic', 'random', 'realistic',
+}
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+
+def normalize_prompt(prompt: str) -> List[str]:
+    """Lowercase, strip punctuation, drop filler words and plural 's'; returns sorted tokens."""
+    words = re.findall(r'[a-z0-9]+', prompt.lower())
+    tokens = set()
+    for word in words:
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        tokens.add(word)
+    return sorted(tokens)
+
+
+def shingles(tokens: List[str], k: int = 3) -> Set[str]:
+    """Word tokens plus character k-grams of each token (order-insensitive, typo-tolerant)."""
+    result = set(tokens)
+    for token in tokens:
+        padded = f'^{token}$'
+        result.update(padded[i:i + k] for i in range(len(padded) - k + 1))
+    return result
+
+
+def _hash32(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=4).digest(), 'little')
+
+
+class PromptCache:
+    """
+    Similarity cache for LLM output keyed by prompt text.
+
+    Prompts are normalized and shingled, MinHash signatures are indexed in
+    an LSH table (`bands` x `rows_per_band` permutations), and LSH candidates
+    are confirmed by exact Jaccard similarity of their shingle sets. Entries
+    are only matched within the same dataset_type, and the least recently
+    used entry is evicted once `max_entries` is reached.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        max_entries: int = 1000,
+        bands: int = 16,
+        rows_per_band: int = 4,
+        seed: int = 1
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.bands = bands
+        self.rows_per_band = rows_per_band
+
+        rng = np.random.default_rng(seed)
+        num_perm = bands * rows_per_band
+        self._a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+        self._entries: 'OrderedDict[Tuple[str, str], Dict[str, Any]]' = OrderedDict()
+        self._buckets: List[Dict[Tuple[str, bytes], Set[Tuple[str, str]]]] = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+        self.stats = {'exact': 0, 'near': 0, 'fresh': 0}
+
+    def signature(self, shingle_set: Set[str]) -> np.ndarray:
+        """MinHash signature: per permutation, the minimum of (a * h + b) mod p over all shingles."""
+        if not shingle_set:
+            return np.full(len(self._a), _MAX_HASH, dtype=np.uint64)
+        hashes = np.fromiter((_hash32(s) for s in shingle_set), dtype=np.uint64, count=len(shingle_set))
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0)
+
+    @staticmethod
+    def _exact_key(prompt: str, dataset_type: str) -> Tuple[str, str]:
+        # "Exact" tolerates only case and whitespace differences
+        return dataset_type, ' '.join(prompt.lower().split())
+
+    def _band_keys(self, dataset_type: str, signature: np.ndarray) -> List[Tuple[str, bytes]]:
+        bands = signature.reshape(self.bands, self.rows_per_band)
+        return [(dataset_type, band.tobytes()) for band in bands]
+
+    def lookup(self, prompt: str, dataset_type: str) -> Optional[Tuple[Any, str]]:
+        """
+        Find a stored value for the prompt.
+
+        Returns:
+            (value, 'exact' | 'near') or None on a miss
+        """
+        tokens = normalize_prompt(prompt)
+        if not tokens:
+            # Nothing distinctive to match on (e.g. "generate data")
+            return None
+        key = self._exact_key(prompt, dataset_type)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats['exact'] += 1
+                return entry['value'], 'exact'
+
+        shingle_set = shingles(tokens)
+        band_keys = self._band_keys(dataset_type, self.signature(shingle_set))
+
+        with self._lock:
+            candidates = set()
+            for table, band_key in zip(self._buckets, band_keys):
+                candidates.update(table.get(band_key, ()))
+
+            best_key, best_score = None, 0.0
+            for candidate in candidates:
+                stored = self._entries[candidate]['shingles']
+                union = len(shingle_set | stored)
+                score = len(shingle_set & stored) / union if union else 0.0
+                if score > best_score:
+                    best_key, best_score = candidate, score
+
+            if best_key is not None and best_score >= self.threshold:
+                self._entries.move_to_end(best_key)
+                self.stats['near'] += 1
+                return self._entries[best_key]['value'], 'near'
+
+            self.stats['fresh'] += 1
+            return None
+
+    def store(self, prompt: str, dataset_type: str, value: Any) -> None:
+        tokens = normalize_prompt(prompt)
+        if not tokens or self.max_entries <= 0:
+            return
+        key = self._exact_key(prompt, dataset_type)
+        shingle_set = shingles(tokens)
+        band_keys = self._band_keys(dataset_type, self.signature(shingle_set))
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {'value': value, 'shingles': shingle_set, 'band_keys': band_keys}
+            for table, band_key in zip(self._buckets, band_keys):
+                table.setdefault(band_key, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key)
+        for table, band_key in zip(self._buckets, entry['band_keys']):
+            bucket = table.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del table[band_key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Shared cache for generated CSV text; set PROMPT_CACHE_MAX_ENTRIES=0 to disable
+prompt_cache = PromptCache(
+    threshold=float(os.getenv('PROMPT_CACHE_THRESHOLD', '0.8')),
+    max_entries=int(os.getenv('PROMPT_CACHE_MAX_ENTRIES', '1000'))
+)
@@ -0,0 +1,158 @@
+# timeaxis.py
+
+import re
+import threading
+import pandas as pd
+import numpy as np
+from pandas.tseries.api import guess_datetime_format
+from pandas.tseries.frequencies import to_offset
+from typing import Dict, Optional
+
+# Values inspected to infer a datetime format, and the share of them that must parse
+DATETIME_SAMPLE_SIZE = 50
+DATETIME_PARSE_THRESHOLD = 0.9
+
+# Format marker for columns no single strftime format covers ("Jan 2023", "2023Q1")
+MIXED_FORMAT = 'mixed'
+
+# Inferred formats keyed by column signature (name + digit-masked shapes of sampled values)
+_datetime_format_cache: Dict[tuple, Optional[str]] = {}
+_datetime_format_cache_lock = threading.Lock()
+_DATETIME_FORMAT_CACHE_SIZE = 512
+
+
+def _parses(values: pd.Series, fmt: str) -> bool:
+    parsed = pd.to_datetime(values, format=fmt, errors='coerce')
+    return parsed.notna().mean() >= DATETIME_PARSE_THRESHOLD
+
+
+def infer_datetime_format(series: pd.Series) -> Optional[str]:
+    """
+    Infer a strftime format for a text column from a sample of its values.
+
+    Falls back to MIXED_FORMAT when the values are dates pandas can parse
+    but no single strftime format describes them. Results are cached per
+    column signature, so columns with the same name and value layout
+    (e.g. 'date' holding YYYY-MM-DD) are only inferred once.
+
+    Args:
+        series: Column to inspect
+
+    Returns:
+        Format string, MIXED_FORMAT, or None if the values do not look like dates
+    """
+    sample = series.dropna().astype(str).str.strip().unique()[:DATETIME_SAMPLE_SIZE]
+    if len(sample) == 0:
+        return None
+
+    signature = (series.name, tuple(sorted({re.sub(r'\d', '9', value) for value in sample})))
+    with _datetime_format_cache_lock:
+        if signature in _datetime_format_cache:
+            return _datetime_format_cache[signature]
+
+    values = pd.Series(sample)
+    fmt = None
+    for value in sample[:5]:
+        guess = guess_datetime_format(value)
+        if guess is not None and _parses(values, guess):
+            fmt = guess
+            break
+    if fmt is None and _parses(values, MIXED_FORMAT):
+        fmt = MIXED_FORMAT
+
+    with _datetime_format_cache_lock:
+        if len(_datetime_format_cache) >= _DATETIME_FORMAT_CACHE_SIZE:
+            _datetime_format_cache.pop(next(iter(_datetime_format_cache)))
+        _datetime_format_cache[signature] = fmt
+    return fmt
+
+
+def parse_datetime_column(series: pd.Series) -> Optional[pd.Series]:
+    """
+    Parse a column as datetimes with its inferred format.
+
+    Columns with a strftime format are parsed in one vectorized call; mixed
+    columns are parsed once per distinct value.
+
+    Returns:
+        Parsed datetime series, or None if the column is not a date column
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return None
+
+    fmt = infer_datetime_format(series)
+    if fmt is None:
+        return None
+
+    if fmt == MIXED_FORMAT:
+        codes, uniques = pd.factorize(series.astype('string').str.strip())
+        parsed_uniques = pd.DatetimeIndex(pd.to_datetime(np.asarray(uniques, dtype=object), format=MIXED_FORMAT, errors='coerce'))
+        parsed = pd.Series(parsed_uniques.take(codes, allow_fill=True, fill_value=pd.NaT), index=series.index, name=series.name)
+    else:
+        parsed = pd.to_datetime(series, format=fmt, errors='coerce')
+    if parsed.notna().sum() < DATETIME_PARSE_THRESHOLD * series.notna().sum():
+        return None
+    return parsed
+
+
+def infer_time_frequency(times: pd.Series):
+    """
+    Infer the calendar frequency of a datetime column.
+
+    Uses pandas' frequency inference for regular series and otherwise
+    classifies the median spacing (monthly, quarterly and yearly spacings
+    become calendar offsets, anchored at month start/end when the data is).
+
+    Returns:
+        A pandas DateOffset, or None with fewer than two distinct timestamps
+    """
+    unique = pd.DatetimeIndex(times.dropna().unique()).as_unit('ns').sort_values()
+    if len(unique) < 2:
+        return None
+
+    if len(unique) >= 3:
+        freq = pd.infer_freq(unique)
+        if freq:
+            return to_offset(freq)
+
+    median_ns = int(np.median(np.diff(unique.asi8)))
+    median_days = median_ns / 86_400e9
+    month_start = bool((unique.day == 1).all())
+    month_end = bool(unique.is_month_end.all())
+
+    for low, high, months, start, end in ((27, 32, 1, 'MS', 'ME'), (88, 93, 3, 'QS', 'QE'), (360, 370, 12, 'YS', 'YE')):
+        if low <= median_days <= high:
+            if month_start:
+                return to_offset(start)
+            if month_end:
+                return to_offset(end)
+            return pd.DateOffset(months=months)
+
+    return to_offset(pd.Timedelta(median_ns, unit='ns'))
+
+
+def epoch_seconds(times) -> np.ndarray:
+    """int64 seconds since the epoch for a datetime series or index."""
+    return np.asarray(times, dtype='datetime64[ns]').astype('datetime64[s]').astype(np.int64)
+
+
+def format_datetimes(times) -> np.ndarray:
+    """
+    Format datetimes as ISO strings without per-element Python calls.
+
+    Dates are written as YYYY-MM-DD when every timestamp is midnight and as
+    YYYY-MM-DDTHH:MM:SS otherwise; missing values become None.
+    """
+    values = np.asarray(times, dtype='datetime64[ns]').astype('datetime64[s]')
+    missing = np.isnat(values)
+    present = values[~missing]
+    date_only = bool((present == present.astype('datetime64[D]')).all())
+
+    out = np.full(len(values), None, dtype=object)
+    if date_only:
+        out[~missing] = np.datetime_as_string(present.astype('datetime64[D]'), unit='D')
+    else:
+        out[~missing] = np.datetime_as_string(present, unit='s')
+    return out
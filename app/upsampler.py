@@ -0,0 +1,414 @@
+# upsampler.py
+
+import math
+import re
+import pandas as pd
+import numpy as np
+from scipy.special import ndtr, ndtri
+from typing import Any, Dict, List, Optional, Tuple
+from timeaxis import parse_datetime_column, infer_time_frequency, epoch_seconds, format_datetimes
+
+# Integer columns with evenly spaced values in this range are treated as years
+YEAR_RANGE = (1800, 2100)
+# Time axes are extended up to this year; rows past it are drawn at earlier timestamps
+TIME_AXIS_MAX_YEAR = 2200
+# Trends explaining less of a column's variance than this are treated as noise (flat)
+TREND_MIN_R2 = 0.3
+# Trends are extrapolated at most this many seed time spans past the last seed timestamp;
+# later rows scatter their residuals around the trend level reached there
+TREND_HORIZON = 1.0
+# Float columns are rounded to the seed's decimal places, up to this many
+MAX_DECIMALS = 6
+# Column names marking integer columns as row ids or keys rather than measurements
+ID_NAME_PATTERN = re.compile(r"(?i:(^|[_\s-])(id|no|num|number|index|idx|key|seq|#))$|[a-z](Id|ID)$")
+
+
+def _parse_dates(series: pd.Series) -> Optional[pd.Series]:
+    """Return the series parsed as datetimes if it looks like a date column, else None."""
+    if series.dropna().empty:
+        return None
+    return parse_datetime_column(series)
+
+
+def _on_grid(unique: pd.DatetimeIndex, freq, min_points: int = 3) -> bool:
+    """True if the distinct timestamps sit on (and mostly fill) a regular grid."""
+    if len(unique) < min_points or freq is None:
+        return False
+    grid = pd.date_range(unique[0], unique[-1], freq=freq)
+    return len(grid) <= 2 * len(unique) and bool(unique.isin(grid).all())
+
+
+def find_time_axis(df: pd.DataFrame, dataset_type: str = "tabular") -> Optional[Dict[str, Any]]:
+    """
+    Find the column that orders the rows in time, if any.
+
+    A date column qualifies when its distinct values lie on a regular grid;
+    an integer column qualifies when it holds evenly spaced years (two
+    distinct timestamps are enough for time_series datasets). Rows sharing
+    a timestamp (panel data) are described by `repeats` and, when one
+    categorical column holds the same set of values at every timestamp,
+    by `key`.
+    """
+    axis = None
+    min_points = 2 if dataset_type == "time_series" else 3
+    for col in df.columns:
+        series = df[col]
+        if series.isna().any():
+            continue
+        dates = _parse_dates(series)
+        if dates is not None:
+            unique = pd.DatetimeIndex(dates.unique()).as_unit("ns").sort_values()
+            freq = infer_time_frequency(dates)
+            if _on_grid(unique, freq, min_points):
+                axis = {"column": col, "kind": "date", "values": dates.to_numpy(dtype="datetime64[ns]"),
+                        "x": epoch_seconds(dates).astype(float), "last": unique[-1], "freq": freq}
+                break
+        elif pd.api.types.is_integer_dtype(series):
+            unique = np.unique(series.to_numpy())
+            diffs = np.diff(unique)
+            if (len(unique) >= min_points and YEAR_RANGE[0] <= unique[0]
+                    and unique[-1] <= YEAR_RANGE[1] and np.all(diffs == diffs[0])):
+                axis = {"column": col, "kind": "year", "values": series.to_numpy(), "x": series.to_numpy(dtype=float),
+                        "last": int(unique[-1]), "step": int(diffs[0])}
+                break
+    if axis is None:
+        return None
+
+    counts = pd.Series(axis["values"]).value_counts()
+    axis["horizon"] = axis["x"].max() + TREND_HORIZON * (axis["x"].max() - axis["x"].min())
+    axis["repeats"] = max(int(round(counts.mean())), 1)
+    axis["key"] = None
+    if axis["repeats"] > 1 and counts.nunique() == 1:
+        for col in df.columns:
+            series = df[col]
+            if col == axis["column"] or pd.api.types.is_numeric_dtype(series) or series.isna().any():
+                continue
+            if series.nunique() == axis["repeats"] and (series.groupby(axis["values"]).nunique() == axis["repeats"]).all():
+                axis["key"] = col
+                axis["keys"] = pd.unique(series)
+                axis["key_values"] = series.to_numpy()
+                break
+    return axis
+
+
+def _future_dates(last: pd.Timestamp, freq, periods: int) -> pd.DatetimeIndex:
+    horizon = pd.Timestamp(year=TIME_AXIS_MAX_YEAR, month=12, day=31)
+    try:
+        end = last + freq * periods
+    except (OverflowError, ValueError):  # past the datetime64 range
+        end = None
+    if end is not None and end <= horizon:
+        return pd.date_range(start=last + freq, periods=periods, freq=freq)
+    return pd.date_range(start=last + freq, end=horizon, freq=freq)
+
+
+def extend_time_axis(axis: Dict[str, Any], n: int,
+                     rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """
+    Continue a time axis past the seed for `n` rows.
+
+    Each new timestamp gets the seed's number of rows per timestamp (cycling
+    the panel key, if any). Rows that do not fit before TIME_AXIS_MAX_YEAR
+    are placed at timestamps (and keys) drawn from the seed and the
+    extension, rather than being stacked onto the last timestamps.
+
+    Returns:
+        (axis values, numeric positions for the trend fits, panel keys or None)
+    """
+    periods = math.ceil(n / axis["repeats"])
+    if axis["kind"] == "date":
+        steps = np.asarray(_future_dates(axis["last"], axis["freq"], periods), dtype="datetime64[ns]")
+    else:
+        available = max((TIME_AXIS_MAX_YEAR - axis["last"]) // axis["step"], 0)
+        steps = axis["last"] + axis["step"] * np.arange(1, min(periods, available) + 1)
+
+    values = np.repeat(steps, axis["repeats"])[:n]
+    keys = None
+    if axis["key"] is not None:
+        keys = np.tile(axis["keys"], len(steps))[:n]
+
+    overflow = n - len(values)
+    if overflow > 0:
+        pool = np.concatenate([axis["values"], values])
+        idx = rng.integers(len(pool), size=overflow)
+        values = np.concatenate([values, pool[idx]])
+        if keys is not None:
+            keys = np.concatenate([keys, np.concatenate([axis["key_values"], keys])[idx]])
+
+    x = epoch_seconds(values).astype(float) if axis["kind"] == "date" else values.astype(float)
+    return values, x, keys
+
+
+def _fit_trend(x: np.ndarray, y: np.ndarray, keys: Optional[np.ndarray]) -> Dict[Any, Tuple[float, float]]:
+    """Least-squares line per panel key (or one overall) of y against the time position x; flat if weak."""
+    groups = {None: np.ones(len(y), dtype=bool)} if keys is None else {k: keys == k for k in pd.unique(keys)}
+    trend = {}
+    for key, mask in groups.items():
+        mask = mask & ~np.isnan(y)
+        slope, intercept = 0.0, float(y[mask].mean()) if mask.any() else 0.0
+        if np.unique(x[mask]).size >= 2 and np.unique(y[mask]).size >= 2:
+            r = np.corrcoef(x[mask], y[mask])[0, 1]
+            if r * r >= TREND_MIN_R2:
+                slope, intercept = np.polyfit(x[mask], y[mask], 1)
+        trend[key] = (float(slope), float(intercept))
+    return trend
+
+
+def _trend_values(trend: Dict[Any, Tuple[float, float]], x: np.ndarray, keys: Optional[np.ndarray],
+                  horizon: Optional[float] = None) -> np.ndarray:
+    if horizon is not None:
+        x = np.minimum(x, horizon)
+    if keys is None:
+        slope, intercept = trend[None]
+        return slope * x + intercept
+    out = np.zeros(len(x))
+    for key, (slope, intercept) in trend.items():
+        mask = keys == key
+        out[mask] = slope * x[mask] + intercept
+    return out
+
+
+def _is_sequence(values: np.ndarray, name: Any = None) -> bool:
+    """
+    Detect row id columns: unique, evenly spaced, increasing integers that
+    either count up by one from 0 or 1 or sit in an id-like column ("id",
+    "order_no", "customerId"). Other evenly spaced columns, such as salaries
+    in steps of 1000, are measurements.
+    """
+    if len(values) < 3 or not np.all(np.mod(values, 1) == 0):
+        return False
+    diffs = np.diff(values)
+    if not (diffs[0] > 0 and np.all(diffs == diffs[0])):
+        return False
+    return bool((diffs[0] == 1 and values[0] in (0, 1)) or ID_NAME_PATTERN.search(str(name)))
+
+
+def _decimals(values: np.ndarray) -> Optional[int]:
+    """Number of decimal places the values are written with, or None beyond MAX_DECIMALS."""
+    scale = np.maximum(np.abs(values), 1.0)
+    for places in range(MAX_DECIMALS + 1):
+        if np.all(np.abs(np.round(values, places) - values) <= 1e-9 * scale):
+            return places
+    return None
+
+
+def _nearest_correlation(corr: np.ndarray) -> np.ndarray:
+    """Clip negative eigenvalues so the correlation matrix is positive definite."""
+    corr = np.nan_to_num(corr, nan=0.0)
+    np.fill_diagonal(corr, 1.0)
+    eigvals, eigvecs = np.linalg.eigh(corr)
+    eigvals = np.clip(eigvals, 1e-6, None)
+    corr = eigvecs @ np.diag(eigvals) @ eigvecs.T
+    scale = np.sqrt(np.diag(corr))
+    return corr / np.outer(scale, scale)
+
+
+def fit_marginals(df: pd.DataFrame, dataset_type: str = "tabular") -> Dict[str, Any]:
+    """
+    Fit per-column marginals and a Gaussian copula over the continuous columns.
+
+    When the data has a time axis (see `find_time_axis`), numeric columns are
+    fitted as a linear trend over time (per panel key) plus residuals, and
+    the copula is fitted over the residuals.
+
+    Args:
+        df: Seed dataframe (typically the rows returned by the LLM)
+        dataset_type: "tabular" or "time_series"
+
+    Returns:
+        Model dictionary consumed by `sample_rows`
+    """
+    columns: Dict[str, Dict[str, Any]] = {}
+    continuous: List[str] = []
+    scores = []
+
+    axis = find_time_axis(df, dataset_type)
+    seed_keys = None
+    if axis is not None:
+        columns[axis["column"]] = {"kind": "axis"}
+        if axis["key"] is not None:
+            columns[axis["key"]] = {"kind": "key"}
+            seed_keys = df[axis["key"]].to_numpy()
+
+    for col in df.columns:
+        if col in columns:
+            continue
+        series = df[col]
+        null_rate = float(series.isna().mean())
+        dates = _parse_dates(series)
+
+        if dates is not None:
+            raw = dates.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(float)
+            raw[dates.isna().to_numpy()] = np.nan
+            valid = dates.dropna()
+            spec = {"kind": "date", "date_only": bool((valid.dt.normalize() == valid).all()), "null_rate": null_rate}
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            raw = series.to_numpy(dtype=float)
+            values = raw[~np.isnan(raw)]
+            if values.size == 0:
+                columns[col] = {"kind": "constant", "value": np.nan}
+                continue
+            if series.notna().all() and _is_sequence(values, col):
+                columns[col] = {"kind": "sequence", "start": values[-1], "step": values[1] - values[0]}
+                continue
+            spec = {"kind": "numeric", "decimals": _decimals(values), "null_rate": null_rate}
+            if axis is not None and np.unique(values).size >= 2:
+                # Model the value as trend over time plus residual; never go below a non-negative seed
+                spec["trend"] = _fit_trend(axis["x"], raw, seed_keys)
+                spec["floor"] = 0.0 if values.min() >= 0 else None
+                raw = raw - _trend_values(spec["trend"], axis["x"], seed_keys)
+        else:
+            counts = series.value_counts(dropna=True)
+            if counts.empty:
+                columns[col] = {"kind": "constant", "value": np.nan}
+                continue
+            columns[col] = {
+                "kind": "categorical",
+                "values": counts.index.to_numpy(),
+                "probs": (counts / counts.sum()).to_numpy(),
+                "null_rate": null_rate,
+            }
+            continue
+
+        values = raw[~np.isnan(raw)]
+        if "trend" not in spec and np.unique(values).size < 2:
+            columns[col] = {"kind": "constant", "value": series.dropna().iloc[0]}
+            continue
+
+        spec["sorted"] = np.sort(values)
+        columns[col] = spec
+        continuous.append(col)
+
+        # Normal scores of the ranks (mean rank for ties) feed the copula correlation
+        ranks = pd.Series(raw).rank(method="average").to_numpy()
+        z = ndtri(ranks / (values.size + 1))
+        scores.append(np.nan_to_num(z, nan=0.0))
+
+    if continuous:
+        corr = np.corrcoef(np.vstack(scores)) if len(continuous) > 1 else np.ones((1, 1))
+        chol = np.linalg.cholesky(_nearest_correlation(np.atleast_2d(corr)))
+    else:
+        chol = None
+
+    return {"columns": columns, "order": list(df.columns), "continuous": continuous, "cholesky": chol, "axis": axis}
+
+
+def _inverse_ecdf(u: np.ndarray, sorted_values: np.ndarray) -> np.ndarray:
+    """Map uniforms through the piecewise-linear inverse of the empirical CDF."""
+    n = len(sorted_values)
+    grid = (np.arange(1, n + 1) - 0.5) / n
+    return np.interp(u, grid, sorted_values)
+
+
+def _apply_nulls(values: np.ndarray, null_rate: float, rng: np.random.Generator) -> np.ndarray:
+    if null_rate > 0:
+        values = values.astype(object) if values.dtype.kind not in "fc" else values
+        values[rng.random(len(values)) < null_rate] = np.nan if values.dtype.kind == "f" else None
+    return values
+
+
+def sample_rows(model: Dict[str, Any], n: int, seed: Optional[int] = None) -> pd.DataFrame:
+    """
+    Draw `n` synthetic rows from a model produced by `fit_marginals`.
+
+    Args:
+        model: Fitted model
+        n: Number of rows to sample
+        seed: Optional random seed for reproducible output
+
+    Returns:
+        DataFrame with the same columns as the seed data
+    """
+    rng = np.random.default_rng(seed)
+    columns = model["columns"]
+    out: Dict[str, Any] = {}
+
+    axis = model["axis"]
+    if axis is not None:
+        out[axis["column"]], x, keys = extend_time_axis(axis, n, rng)
+        if axis["key"] is not None:
+            out[axis["key"]] = keys
+
+    if model["continuous"]:
+        z = rng.standard_normal((n, len(model["continuous"]))) @ model["cholesky"].T
+        u = ndtr(z)
+        for j, col in enumerate(model["continuous"]):
+            spec = columns[col]
+            values = _inverse_ecdf(u[:, j], spec["sorted"])
+            if spec["kind"] == "date":
+                dates = values.astype(np.int64).astype("datetime64[ns]")
+                if spec["date_only"]:
+                    # Format each distinct day once and index into the lookup table
+                    days = dates.astype("datetime64[D]").astype(np.int64)
+                    lo = days.min()
+                    table = np.datetime_as_string(np.arange(lo, days.max() + 1).astype("datetime64[D]"), unit="D")
+                    values = table.astype(object)[days - lo]
+                else:
+                    values = np.datetime_as_string(dates.astype("datetime64[s]"), unit="s").astype(object)
+            if "trend" in spec:
+                values = values + _trend_values(spec["trend"], x, keys, axis["horizon"])
+                if spec["floor"] is not None:
+                    values = np.maximum(values, spec["floor"])
+            if spec["kind"] == "numeric" and spec["decimals"] is not None:
+                values = np.round(values, spec["decimals"])
+            out[col] = _apply_nulls(values, spec["null_rate"], rng)
+
+    for col, spec in columns.items():
+        kind = spec["kind"]
+        if kind == "categorical":
+            idx = rng.choice(len(spec["values"]), size=n, p=spec["probs"])
+            out[col] = _apply_nulls(spec["values"][idx], spec["null_rate"], rng)
+        elif kind == "sequence":
+            out[col] = spec["start"] + spec["step"] * np.arange(1, n + 1)
+        elif kind == "constant":
+            out[col] = np.full(n, spec["value"], dtype=object)
+
+    return pd.DataFrame({col: out[col] for col in model["order"]})
+
+
+def upsample_dataframe(df: pd.DataFrame, row_count: int, seed: Optional[int] = None, dataset_type: str = "tabular") -> pd.DataFrame:
+    """
+    Resize the seed dataframe to exactly `row_count` rows.
+
+    Smaller targets are a plain slice. Larger targets keep the seed rows and
+    append rows sampled from fitted marginals and a Gaussian copula; data
+    with a time axis is continued past its last timestamp and sorted by it.
+    """
+    if row_count <= len(df) or df.empty:
+        return df.head(row_count)
+
+    model = fit_marginals(df, dataset_type)
+    synthetic = sample_rows(model, row_count - len(df), seed=seed)
+    axis = model["axis"]
+
+    df = df.copy()
+    positions = None
+    if axis is not None:
+        order = np.argsort(axis["x"], kind="stable")
+        df = df.iloc[order].reset_index(drop=True)
+        synthetic_times = synthetic[axis["column"]].to_numpy()
+        positions = np.concatenate([axis["x"][order], epoch_seconds(synthetic_times) if axis["kind"] == "date"
+                                    else synthetic_times.astype(float)])
+        if axis["kind"] == "date":
+            # Seed and continued timestamps are written in one ISO format
+            times = np.concatenate([np.asarray(axis["values"], dtype="datetime64[ns]")[order],
+                                    synthetic[axis["column"]].to_numpy(dtype="datetime64[ns]")])
+            formatted = format_datetimes(times)
+            df[axis["column"]] = formatted[:len(df)]
+            synthetic[axis["column"]] = formatted[len(df):]
+
+    for col in df.columns:
+        spec = model["columns"][col]
+        if spec["kind"] == "date":
+            # Seed dates are rewritten in the same ISO format as the sampled ones
+            parsed = _parse_dates(df[col])
+            df[col] = parsed.dt.strftime("%Y-%m-%d" if spec["date_only"] else "%Y-%m-%dT%H:%M:%S")
+        elif pd.api.types.is_integer_dtype(df[col]) and synthetic[col].notna().all():
+            # Keep the seed dtypes where the sampled values allow it
+            synthetic[col] = synthetic[col].astype(df[col].dtype)
+
+    out = pd.concat([df, synthetic], ignore_index=True)
+    if positions is not None and not np.all(np.diff(positions) >= 0):
+        # Rows past TIME_AXIS_MAX_YEAR reuse earlier timestamps; keep the table in time order
+        out = out.iloc[np.argsort(positions, kind="stable")].reset_index(drop=True)
+    return out
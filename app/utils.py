@@ -1,6 +1,58 @@
 import pandas as pd
 import io
+import os
 import re
+import json
+import gzip
+import zipfile
+
+try:
+    import zstandard
+except ImportError:  # zstd uploads are only accepted when zstandard is installed
+    zstandard = None
+
+from upsampler import upsample_dataframe
+
+# Magic numbers of the compressed upload formats we accept
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+ZIP_MAGIC = b'PK\x03\x04'
+
+# Largest CSV (after decompression) accepted from an upload
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(512 * 1024 * 1024)))
+
+class UploadTooLargeError(ValueError):
+    """The (decompressed) upload exceeds MAX_UPLOAD_BYTES."""
+
+class LimitedReader(io.RawIOBase):
+    """
+    Binary stream that stops with UploadTooLargeError once more than `limit`
+    bytes have been read from `raw`. Closing it closes the decompression
+    objects in `closers`, not the uploaded file itself.
+    """
+
+    def __init__(self, raw, limit, closers=()):
+        self._raw = raw
+        self._limit = limit
+        self._closers = closers
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._raw.read(len(buffer))
+        self.bytes_read += len(data)
+        if self.bytes_read > self._limit:
+            raise UploadTooLargeError(f"The uploaded CSV is larger than {self._limit / (1024 * 1024):g} MB once decompressed")
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            for closer in self._closers:
+                closer.close()
+        super().close()
 
 def csv_text_to_dataframe(csv_text):
     try:
@@ -101,3 +153,110 @@ def clean_dataframe_for_export(df):
             pass
     
     return df_clean
+
+
+def detect_compression(fileobj, filename=None):
+    """
+    Detect the compression of an uploaded file from its magic bytes,
+    falling back to the file extension. Returns 'gzip', 'zstd', 'zip' or None.
+    """
+    position = fileobj.tell()
+    head = fileobj.read(4)
+    fileobj.seek(position)
+
+    if head.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if head.startswith(ZSTD_MAGIC):
+        return 'zstd'
+    if head.startswith(ZIP_MAGIC):
+        return 'zip'
+
+    name = (filename or '').lower()
+    for extension, compression in (('.gz', 'gzip'), ('.zst', 'zstd'), ('.zip', 'zip')):
+        if name.endswith(extension):
+            return compression
+    return None
+
+def open_csv_upload(fileobj, filename=None, max_bytes=None):
+    """
+    Return a binary stream of the CSV content of an upload, decompressing
+    gzip, zstd or zip archives on the fly instead of reading them into memory.
+
+    Reading more than `max_bytes` (default MAX_UPLOAD_BYTES) of CSV content
+    raises UploadTooLargeError. Unsupported or broken archives raise
+    ValueError. Close the returned stream when done.
+    """
+    max_bytes = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    fileobj.seek(0)
+    compression = detect_compression(fileobj, filename)
+
+    if compression == 'gzip':
+        stream = gzip.GzipFile(fileobj=fileobj, mode='rb')
+        return LimitedReader(stream, max_bytes, [stream])
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ValueError("zstd-compressed uploads require the 'zstandard' package")
+        stream = zstandard.ZstdDecompressor().stream_reader(fileobj, closefd=False)
+        return LimitedReader(stream, max_bytes, [stream])
+    if compression == 'zip':
+        try:
+            archive = zipfile.ZipFile(fileobj)
+        except zipfile.BadZipFile:
+            raise ValueError("The uploaded zip archive is corrupt")
+        members = [info for info in archive.infolist() if not info.is_dir()]
+        csv_members = [info for info in members if info.filename.lower().endswith('.csv')]
+        if not (csv_members or members):
+            archive.close()
+            raise ValueError("The uploaded zip archive is empty")
+        member = archive.open((csv_members or members)[0])
+        return LimitedReader(member, max_bytes, [member, archive])
+    return LimitedReader(fileobj, max_bytes)
+
+def read_csv_upload(fileobj, filename=None, encodings=('utf-8', 'latin1', 'windows-1252')):
+    """
+    Parse an uploaded (optionally compressed) CSV file, trying each encoding in turn.
+
+    Raises:
+        ValueError: unsupported archive, or UploadTooLargeError past MAX_UPLOAD_BYTES
+
+    Returns:
+        Tuple of (DataFrame or None, encoding used or None)
+    """
+    for encoding in encodings:
+        with open_csv_upload(fileobj, filename) as stream:
+            try:
+                df = pd.read_csv(stream, encoding=encoding)
+            except UploadTooLargeError:
+                raise
+            except Exception as e:
+                print(f"Failed to read with {encoding}: {str(e)}")
+                continue
+        print(f"Successfully read file with {encoding} encoding")
+        return df, encoding
+    return None, None
+
+def build_table_payload(csv_text, row_count, dataset_type="tabular", **extra):
+    """
+    Turn LLM CSV text into the /generate response body: parse, slice or
+    upsample to `row_count`, clean and serialize to JSON bytes, with any
+    `extra` fields added. CPU-bound, so the API runs it in the process pool.
+    """
+    df = csv_text_to_dataframe(csv_text)
+
+    # Slice or upsample the LLM seed rows to the requested row count
+    df = upsample_dataframe(df, row_count, dataset_type=dataset_type)
+
+    # Clean the dataframe
+    df_clean = clean_dataframe_for_export(df)
+
+    # Convert to CSV for response
+    csv_data = df_clean.to_csv(index=False, encoding='utf-8')
+
+    return json.dumps({
+        "success": True,
+        "data": csv_data,
+        "columns": list(df_clean.columns),
+        "row_count": len(df_clean),
+        "column_count": len(df_clean.columns),
+        **extra
+    }).encode('utf-8')
@@ -0,0 +1,343 @@
+"""
+Offline load test for the DataGen API.
+
+Starts local stand-ins for the OpenRouter chat-completions API and the
+Stable Horde async generate/status/download flow, runs the API against
+them, and drives /api/generate, /api/predict and the image generation path
+at a configurable concurrency. Reports throughput and p50/p95/p99 latency
+per endpoint. No API keys or network access are needed.
+
+Usage:
+    python load_test.py --requests 200 --concurrency 20
+    python load_test.py --endpoints generate --llm-latency 1.5 --llm-error-rate 0.05
+
+To drive an already running API, start it against the stubs' port and pass
+the same port here:
+
+    OPENROUTER_BASE_URL=http://127.0.0.1:9100/api/v1 STABLE_HORDE_BASE_URL=http://127.0.0.1:9100/api/v2 \
+        uvicorn api:app --app-dir app --port 8000
+    python load_test.py --target http://localhost:8000 --stub-port 9100
+"""
+
+import argparse
+import asyncio
+import io
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+import numpy as np
+import pandas as pd
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app")
+
+STUB_CSV_HEADER = "Date,Region,Units,Price,Revenue"
+REGIONS = ["North", "South", "East", "West"]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port} after {timeout:.0f}s")
+
+
+def stub_csv(rows=20):
+    lines = [STUB_CSV_HEADER]
+    for i in range(rows):
+        units = random.randint(5, 50)
+        price = round(random.uniform(1.5, 3.5), 2)
+        lines.append(f"2023-{1 + i % 12:02d}-{1 + i % 28:02d},{random.choice(REGIONS)},{units},{price},{round(units * price, 2)}")
+    return "\n".join(lines)
+
+
+# ---------------------------------------------------------------------------
+# Provider stand-ins
+# ---------------------------------------------------------------------------
+
+def build_stub_app(settings):
+    """FastAPI app mimicking OpenRouter chat completions and Stable Horde."""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, Response
+    from PIL import Image
+
+    app = FastAPI()
+    generations = {}
+
+    def latency(mean):
+        return max(0.0, random.gauss(mean, mean * settings["latency_jitter"]))
+
+    def injected_error(rate):
+        if random.random() < rate:
+            status = random.choice([429, 500, 503])
+            return JSONResponse({"error": {"message": "stub failure", "code": status}}, status_code=status)
+        return None
+
+    @app.post("/api/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await asyncio.sleep(latency(settings["llm_latency"]))
+        error = injected_error(settings["llm_error_rate"])
+        if error is not None:
+            return error
+
+        content = stub_csv(settings["llm_rows"])
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 400, "total_tokens": 500},
+        }
+
+    @app.post("/api/v2/generate/async")
+    async def horde_submit(request: Request):
+        await asyncio.sleep(latency(0.05))
+        error = injected_error(settings["image_error_rate"])
+        if error is not None:
+            return error
+        generation_id = uuid.uuid4().hex
+        generations[generation_id] = time.monotonic() + latency(settings["image_latency"])
+        return JSONResponse({"id": generation_id}, status_code=202)
+
+    @app.get("/api/v2/generate/status/{generation_id}")
+    async def horde_status(generation_id: str, request: Request):
+        ready_at = generations.get(generation_id)
+        if ready_at is None:
+            return JSONResponse({"message": "not found"}, status_code=404)
+        done = time.monotonic() >= ready_at
+        result = {"done": done, "finished": int(done), "processing": int(not done), "waiting": 0}
+        if done:
+            base = str(request.base_url).rstrip("/")
+            result["generations"] = [{"img": f"{base}/images/{generation_id}.png", "id": generation_id}]
+        return result
+
+    @app.get("/images/{name}")
+    async def horde_image(name: str):
+        # Random noise, so perceptual-hash deduplication sees distinct images
+        buffer = io.BytesIO()
+        Image.frombytes("RGB", (64, 64), os.urandom(64 * 64 * 3)).save(buffer, "PNG")
+        return Response(buffer.getvalue(), media_type="image/png")
+
+    return app
+
+
+def run_stub_server(port, settings):
+    import uvicorn
+    uvicorn.run(build_stub_app(settings), host="127.0.0.1", port=port, log_level="warning")
+
+
+# ---------------------------------------------------------------------------
+# Load generation
+# ---------------------------------------------------------------------------
+
+def predict_csv(rows, groups=4):
+    per_group = max(rows // groups, 2)
+    df = pd.DataFrame({
+        "date": np.tile(pd.date_range("2020-01-01", periods=per_group, freq="D").strftime("%Y-%m-%d"), groups),
+        "period": np.tile(np.arange(per_group), groups),
+        "region": np.repeat(REGIONS[:groups], per_group),
+        "sales": np.random.default_rng(0).normal(100, 10, per_group * groups).cumsum(),
+    })
+    return df.to_csv(index=False).encode("utf-8")
+
+
+async def run_load(name, make_request, total, concurrency):
+    """Issue `total` calls of `make_request` with at most `concurrency` in flight."""
+    latencies = []
+    errors = {}
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+
+    async def worker():
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                await make_request(i)
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                label = getattr(e, "label", None) or type(e).__name__
+                errors[label] = errors.get(label, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"endpoint": name, "latencies": latencies, "errors": errors, "elapsed": elapsed}
+
+
+class RequestFailed(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.label = f"HTTP {status_code}"
+
+
+def check(response):
+    if response.status_code != 200:
+        raise RequestFailed(response.status_code)
+    return response
+
+
+def report(results):
+    print()
+    print(f"{'endpoint':<12}{'ok':>7}{'err':>6}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    print("-" * 74)
+    for result in results:
+        latencies = np.array(result["latencies"]) * 1000
+        ok = len(latencies)
+        failed = sum(result["errors"].values())
+        throughput = ok / result["elapsed"] if result["elapsed"] > 0 else 0.0
+        if ok:
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            peak = latencies.max()
+        else:
+            p50 = p95 = p99 = peak = float("nan")
+        print(f"{result['endpoint']:<12}{ok:>7}{failed:>6}{throughput:>9.1f}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{peak:>10.1f}")
+        if result["errors"]:
+            details = ", ".join(f"{label}: {count}" for label, count in sorted(result["errors"].items()))
+            print(f"{'':<12}errors -> {details}")
+
+
+async def drive(args, target):
+    results = []
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout)
+
+    async with httpx.AsyncClient(base_url=target, limits=limits, timeout=timeout) as client:
+        if "generate" in args.endpoints:
+            async def generate(i):
+                # Distinct prompts so coalescing does not hide upstream latency
+                data = {"prompt": f"sales data run {i}", "dataset_type": "tabular", "row_count": str(args.rows)}
+                check(await client.post("/api/generate", data=data))
+
+            results.append(await run_load("generate", generate, args.requests, args.concurrency))
+
+        if "predict" in args.endpoints:
+            payload = predict_csv(args.predict_rows)
+
+            async def predict(i):
+                files = {"file": ("load.csv", payload, "text/csv")}
+                data = {"column": "sales", "time_column": "period", "group_column": "region", "steps": "5"}
+                check(await client.post("/api/predict", files=files, data=data))
+
+            results.append(await run_load("predict", predict, args.requests, args.concurrency))
+
+    if "image" in args.endpoints:
+        # There is no HTTP endpoint for images; drive the generator the API would call
+        sys.path.insert(0, APP_DIR)
+        import image_generator
+        image_generator.IMAGE_OUTPUT_DIR = tempfile.mkdtemp(prefix="datagen-load-images-")
+
+        async def image(i):
+            await asyncio.to_thread(image_generator.generate_images_from_prompt, f"a red fox {i}", args.images_per_request)
+
+        results.append(await run_load("image", image, max(args.requests // 10, 1), args.concurrency))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the DataGen API")
+    parser.add_argument("--endpoints", nargs="+", default=["generate", "predict", "image"],
+                        choices=["generate", "predict", "image"])
+    parser.add_argument("--requests", type=int, default=100, help="Requests per endpoint (image path runs a tenth)")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Client timeout per request (s)")
+    parser.add_argument("--rows", type=int, default=100, help="row_count sent to /api/generate")
+    parser.add_argument("--predict-rows", type=int, default=5000, help="Rows in the CSV uploaded to /api/predict")
+    parser.add_argument("--images-per-request", type=int, default=2)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Mean stub LLM latency (s)")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Share of stub calls failing with 429/5xx")
+    parser.add_argument("--llm-rows", type=int, default=20, help="Rows in each stub LLM response")
+    parser.add_argument("--image-error-rate", type=float, default=0.0, help="Share of stub image submissions failing")
+    parser.add_argument("--image-latency", type=float, default=1.0, help="Mean stub image generation time (s)")
+    parser.add_argument("--latency-jitter", type=float, default=0.2, help="Stub latency std-dev as a share of the mean")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the API under test")
+    parser.add_argument("--target", help="Base URL of an already running API (skips starting one); needs --stub-port")
+    parser.add_argument("--stub-port", type=int,
+                        help="Port for the provider stubs (default: a free port). With --target, start the API with "
+                             "OPENROUTER_BASE_URL=http://127.0.0.1:<port>/api/v1 and "
+                             "STABLE_HORDE_BASE_URL=http://127.0.0.1:<port>/api/v2 so it calls the stubs")
+    args = parser.parse_args()
+    if args.target and args.stub_port is None:
+        # An already running API cannot learn a random stub port and would call the real providers
+        parser.error("--target requires --stub-port, with the API started against the stubs on that port "
+                     "(see --help)")
+
+    settings = {
+        "llm_latency": args.llm_latency,
+        "llm_error_rate": args.llm_error_rate,
+        "llm_rows": args.llm_rows,
+        "image_latency": args.image_latency,
+        "image_error_rate": args.image_error_rate,
+        "latency_jitter": args.latency_jitter,
+    }
+
+    stub_port = args.stub_port or free_port()
+    stub = multiprocessing.Process(target=run_stub_server, args=(stub_port, settings), daemon=True)
+    stub.start()
+    wait_for_port(stub_port)
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    print(f"Provider stubs listening on {stub_url}")
+
+    # Both the API subprocess and the in-process image path talk to the stubs
+    os.environ.update({
+        "OPENROUTER_API_KEY": os.getenv("OPENROUTER_API_KEY") or "load-test",
+        "OPENROUTER_BASE_URL": f"{stub_url}/api/v1",
+        "STABLE_HORDE_BASE_URL": f"{stub_url}/api/v2",
+        "STABLE_HORDE_POLL_INTERVAL": os.getenv("STABLE_HORDE_POLL_INTERVAL", "0.2"),
+    })
+
+    api = None
+    target = args.target
+    try:
+        if target is None:
+            api_port = free_port()
+            api = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "api:app", "--app-dir", APP_DIR,
+                 "--host", "127.0.0.1", "--port", str(api_port),
+                 "--workers", str(args.workers), "--log-level", "warning"],
+                env=os.environ.copy(),
+            )
+            wait_for_port(api_port, timeout=60)
+            target = f"http://127.0.0.1:{api_port}"
+            print(f"API under test listening on {target}")
+
+        print(f"Driving {', '.join(args.endpoints)} with {args.requests} requests at concurrency {args.concurrency}...")
+        results = asyncio.run(drive(args, target))
+        report(results)
+    finally:
+        if api is not None:
+            api.terminate()
+            api.wait(timeout=10)
+        stub.terminate()
+        stub.join(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import asyncio
+import gzip
+import zlib
+
+from compression import CompressionMiddleware, select_encoding
+
+
+def run_app(app, accept_encoding="gzip"):
+    """Drive an ASGI app through the middleware; returns the messages sent and the app's progress at each send."""
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append((message, list(app.progress)))
+
+    asyncio.run(CompressionMiddleware(app, minimum_size=1024)(scope, receive, send))
+    return sent
+
+
+class StreamingApp:
+    def __init__(self, chunks, content_type=b"application/x-ndjson"):
+        self.chunks = chunks
+        self.content_type = content_type
+        self.progress = []
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", self.content_type)]})
+        for i, chunk in enumerate(self.chunks):
+            self.progress.append(i)
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(self.chunks) - 1})
+
+
+def test_select_encoding_honours_q_values():
+    assert select_encoding("gzip;q=0") is None
+    assert select_encoding("gzip, deflate") == "gzip"
+
+
+def test_small_streamed_chunk_is_flushed_immediately():
+    records = [b'{"index": 0, "success": false}\n', b'{"index": 1, "success": true}\n']
+    sent = run_app(StreamingApp(records))
+
+    start, _ = sent[0]
+    assert (b"content-encoding", b"gzip") in start["headers"]
+    first_body, progress = sent[1]
+    # The first record went out before the app produced the second one
+    assert progress == [0]
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    assert decoder.decompress(first_body["body"]) == records[0]
+
+    body = b"".join(message["body"] for message, _ in sent[1:])
+    assert gzip.decompress(body) == b"".join(records)
+
+
+def test_small_single_body_is_not_compressed():
+    sent = run_app(StreamingApp([b'{"ok": true}'], content_type=b"application/json"))
+    assert all(name != b"content-encoding" for name, _ in sent[0][0]["headers"])
+    assert sent[1][0]["body"] == b'{"ok": true}'
+
+
+def test_binary_content_is_passed_through():
+    sent = run_app(StreamingApp([b"\x89PNG" * 1000, b"\x00" * 10], content_type=b"image/png"))
+    assert all(name != b"content-encoding" for name, _ in sent[0][0]["headers"])
+    assert sent[1][0]["body"] == b"\x89PNG" * 1000
+
+
+def test_large_single_body_does_not_block_the_loop():
+    body = b"".join(b'{"row": %d, "value": %d}\n' % (i, i * 7919 % 104729) for i in range(200_000))
+    ticks = []
+    sent = []
+
+    class LargeApp:
+        async def __call__(self, scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+            before = len(ticks)
+            await send({"type": "http.response.body", "body": body})
+            self.ticks_during_send = len(ticks) - before
+
+    async def ticker(done):
+        while not done.is_set():
+            ticks.append(None)
+            await asyncio.sleep(0)
+
+    async def main(app):
+        scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", b"gzip")]}
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            sent.append(message)
+
+        done = asyncio.Event()
+        tick_task = asyncio.create_task(ticker(done))
+        await CompressionMiddleware(app, minimum_size=1024)(scope, receive, send)
+        done.set()
+        await tick_task
+
+    app = LargeApp()
+    asyncio.run(main(app))
+
+    # Other tasks kept running while the body was being compressed
+    assert app.ticks_during_send > 0
+    assert gzip.decompress(sent[1]["body"]) == body
+    assert (b"content-length", str(len(sent[1]["body"])).encode()) in sent[0]["headers"]
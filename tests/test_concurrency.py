@@ -0,0 +1,103 @@
+import asyncio
+import json
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from concurrency import AdmissionLimiter, AdmittedStreamingResponse
+
+
+class ClientGone(Exception):
+    pass
+
+
+async def disconnecting_send(message):
+    raise ClientGone()
+
+
+async def empty_receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+def test_queue_full_is_rejected_with_429():
+    async def scenario():
+        limiter = AdmissionLimiter("test", max_concurrent=1, max_queue=1, queue_timeout=5)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as excinfo:
+            await limiter.acquire()
+        assert excinfo.value.status_code == 429
+        assert excinfo.value.headers["Retry-After"] == "1"
+
+        limiter.release()
+        await waiter
+        assert limiter.stats()["active"] == 1
+        assert limiter.stats()["rejected"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_is_rejected_with_503():
+    async def scenario():
+        limiter = AdmissionLimiter("test", max_concurrent=1, max_queue=4, queue_timeout=0.05)
+        await limiter.acquire()
+        with pytest.raises(HTTPException) as excinfo:
+            await limiter.acquire()
+        assert excinfo.value.status_code == 503
+        assert limiter.stats()["queued"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_streaming_response_releases_slot_when_client_leaves_before_body():
+    async def scenario():
+        limiter = AdmissionLimiter("test", max_concurrent=1, max_queue=0)
+        started = []
+
+        async def body():
+            started.append(True)
+            yield b"never sent"
+
+        await limiter.acquire()
+        response = AdmittedStreamingResponse(body(), limiter, media_type="application/x-ndjson")
+        scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+        with pytest.raises(ClientGone):
+            await response(scope, empty_receive, disconnecting_send)
+
+        assert not started
+        assert limiter.stats()["active"] == 0
+        # The slot is usable again
+        await asyncio.wait_for(limiter.acquire(), timeout=1)
+
+    asyncio.run(scenario())
+
+
+def test_batch_endpoint_does_not_leak_slots_on_early_disconnect(monkeypatch):
+    os.environ.setdefault("OPENROUTER_API_KEY", "test")
+    import api
+
+    async def fake_generate_table(prompt, dataset_type="tabular", row_count=100, extra=None):
+        return json.dumps({"success": True, "data": "a\n1\n", **(extra or {})}).encode()
+
+    monkeypatch.setattr(api, "generate_table", fake_generate_table)
+    limiter = api.limiters["generate_batch"]
+    body = json.dumps({"specs": [{"prompt": "sales data"}]}).encode()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": "/api/generate/batch", "raw_path": b"/api/generate/batch",
+        "query_string": b"", "root_path": "", "headers": [(b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def scenario():
+        for _ in range(limiter.max_concurrent + 1):
+            with pytest.raises(ClientGone):
+                await api.app(scope, receive, disconnecting_send)
+        assert limiter.stats()["active"] == 0
+
+    asyncio.run(scenario())
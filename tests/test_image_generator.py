@@ -0,0 +1,84 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import image_generator
+
+
+class FakeHorde:
+    """Returns a queued list of images; each distinct seed gives a visibly different image."""
+
+    def __init__(self, seeds, fail_after=None):
+        self.seeds = list(seeds)
+        self.calls = 0
+        self.fail_after = fail_after
+
+    def __call__(self, prompt):
+        if self.fail_after is not None and self.calls >= self.fail_after:
+            raise RuntimeError("horde unavailable")
+        self.calls += 1
+        rng = np.random.default_rng(self.seeds.pop(0))
+        return Image.fromarray(rng.integers(0, 256, (64, 64, 3), dtype=np.uint8))
+
+
+@pytest.fixture
+def output_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_generator, "IMAGE_OUTPUT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def manifest_images(output_dir):
+    with open(os.path.join(output_dir, image_generator.MANIFEST_NAME)) as f:
+        return [r for r in map(json.loads, f) if "filename" in r]
+
+
+def test_interrupted_run_resumes(output_dir, monkeypatch):
+    monkeypatch.setattr(image_generator, "request_image", FakeHorde([1, 2, 3], fail_after=2))
+    with pytest.raises(RuntimeError):
+        image_generator.generate_images_from_prompt("a fox", count=3)
+
+    horde = FakeHorde([3])
+    monkeypatch.setattr(image_generator, "request_image", horde)
+    image_generator.generate_images_from_prompt("a fox", count=3)
+
+    assert horde.calls == 1
+    assert len(manifest_images(output_dir)) == 3
+
+
+def test_finished_prompt_can_be_regenerated(output_dir, monkeypatch):
+    monkeypatch.setattr(image_generator, "request_image", FakeHorde([1, 2]))
+    image_generator.generate_images_from_prompt("a fox", count=2)
+
+    horde = FakeHorde([3, 4])
+    monkeypatch.setattr(image_generator, "request_image", horde)
+    image_generator.generate_images_from_prompt("a fox", count=2)
+
+    assert horde.calls == 2
+    assert len(manifest_images(output_dir)) == 4
+
+
+def test_fresh_run_ignores_earlier_images(output_dir, monkeypatch):
+    monkeypatch.setattr(image_generator, "request_image", FakeHorde([1, 2], fail_after=2))
+    with pytest.raises(RuntimeError):
+        image_generator.generate_images_from_prompt("a fox", count=3)
+
+    # The same images as the earlier run are not duplicates within a fresh run
+    horde = FakeHorde([1, 2])
+    monkeypatch.setattr(image_generator, "request_image", horde)
+    image_generator.generate_images_from_prompt("a fox", count=2, resume=False)
+
+    assert horde.calls == 2
+    labels = (output_dir / "labels.csv").read_text().strip().splitlines()
+    assert len(labels) == 3
+
+
+def test_near_duplicates_within_a_run_are_dropped(output_dir, monkeypatch):
+    horde = FakeHorde([1, 1, 2])
+    monkeypatch.setattr(image_generator, "request_image", horde)
+    image_generator.generate_images_from_prompt("a fox", count=2)
+
+    assert horde.calls == 3
+    assert len(manifest_images(output_dir)) == 2
@@ -0,0 +1,159 @@
+import threading
+import time
+
+import httpx
+import pytest
+
+import outbound
+from outbound import CircuitBreaker, CircuitOpenError, Provider, SingleFlight
+
+
+def status_error(status, headers=None):
+    request = httpx.Request("POST", "https://upstream.test/v1")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError(f"HTTP {status}", request=request, response=response)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(outbound.time, "sleep", delays.append)
+    return delays
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_half_open_breaker_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+
+    assert breaker.allow()
+    assert not breaker.allow()
+    # A failed trial re-opens the breaker for another reset_timeout
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def run_concurrently(singleflight, key, fn, callers=5):
+    """Start a leader inside `fn`, then the other callers; returns each caller's result or exception."""
+    entered, release = threading.Event(), threading.Event()
+    outcomes = [None] * callers
+
+    def blocking():
+        entered.set()
+        release.wait(5)
+        return fn()
+
+    def caller(i):
+        try:
+            outcomes[i] = singleflight.do(key, blocking)
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(callers)]
+    threads[0].start()
+    assert entered.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+
+def test_singleflight_shares_one_result():
+    calls = []
+    outcomes = run_concurrently(SingleFlight(), "prompt", lambda: calls.append(1) or "csv")
+    assert calls == [1]
+    assert outcomes == ["csv"] * 5
+
+
+def test_singleflight_shares_one_exception():
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise RuntimeError("upstream down")
+
+    outcomes = run_concurrently(SingleFlight(), "prompt", fail)
+    assert calls == [1]
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+
+
+def test_retries_transient_errors_up_to_max_retries(sleeps):
+    provider = Provider("test", max_retries=2, backoff_base=0.0, failure_threshold=10)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        raise status_error(503)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        provider.call(flaky)
+    assert len(calls) == 3
+    assert len(sleeps) == 2
+
+
+def test_retry_after_is_honoured_and_capped(sleeps):
+    provider = Provider("test", max_retries=3, backoff_base=0.0, backoff_cap=5.0)
+    responses = iter([
+        httpx.Response(429, headers={"Retry-After": "2"}),
+        httpx.Response(503, headers={"Retry-After": "120"}),
+        httpx.Response(200, json={"ok": True}),
+    ])
+    provider.client = httpx.Client(transport=httpx.MockTransport(lambda request: next(responses)))
+
+    response = provider.request("GET", "https://upstream.test/v1")
+    assert response.json() == {"ok": True}
+    assert sleeps == [2.0, 5.0]
+
+
+def test_client_errors_are_not_retried_and_leave_the_breaker_alone(sleeps):
+    provider = Provider("test", max_retries=3, failure_threshold=2, reset_timeout=60.0)
+    calls = []
+
+    def bad_request():
+        calls.append(1)
+        raise status_error(400)
+
+    provider.breaker.record_failure()
+    with pytest.raises(httpx.HTTPStatusError):
+        provider.call(bad_request)
+    assert len(calls) == 1 and sleeps == []
+
+    # The earlier upstream failure still counts: one more opens the breaker
+    provider.breaker.record_failure()
+    assert provider.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        provider.call(bad_request)
+
+
+def test_client_error_during_half_open_frees_the_trial():
+    provider = Provider("test", failure_threshold=1, reset_timeout=0.05)
+    provider.breaker.record_failure()
+    time.sleep(0.06)
+
+    def unprocessable():
+        raise status_error(422)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        provider.call(unprocessable)
+    assert provider.breaker.state == "half_open"
+    assert provider.call(lambda: "ok") == "ok"
+    assert provider.breaker.state == "closed"
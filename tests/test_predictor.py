@@ -0,0 +1,125 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from predictor import lttb_indices, predict_column, predict_column_json, predict_columns_json, shape_history
+from timeaxis import format_datetimes, parse_datetime_column
+
+
+def test_format_datetimes_matches_strftime():
+    times = pd.Series(pd.date_range("2024-01-01", periods=1000, freq="37min"))
+    expected = times.dt.strftime("%Y-%m-%dT%H:%M:%S").to_numpy()
+    assert (format_datetimes(times) == expected).all()
+
+    dates = pd.Series([pd.Timestamp("2024-02-29"), pd.NaT])
+    assert list(format_datetimes(dates)) == ["2024-02-29", None]
+
+
+def test_dates_without_strftime_pattern_are_parsed():
+    months = pd.Series(pd.date_range("2021-01-01", periods=12, freq="MS").strftime("%b %Y"), name="month")
+    parsed = parse_datetime_column(months)
+    assert parsed is not None
+    assert parsed.iloc[-1] == pd.Timestamp("2021-12-01")
+
+
+def test_monthly_forecast_steps_by_calendar_month():
+    df = pd.DataFrame({
+        "date": pd.date_range("2022-01-31", periods=12, freq="ME").strftime("%m/%d/%Y"),
+        "sales": np.arange(12.0),
+    })
+    result = predict_column(df, "sales", steps=2)
+
+    assert result["success"]
+    assert result["time_frequency"] == "ME"
+    predicted = [row["date"] for row in result["predictions"] if row["source"] == "predicted"]
+    assert predicted == ["2023-01-31", "2023-02-28"]
+
+
+def test_unrecognised_dates_give_an_explicit_error():
+    df = pd.DataFrame({"period": ["FY2020", "FY2021", "FY2022"], "v": [1.0, 2.0, 3.0]})
+    result = predict_column(df, "v", time_column="period")
+
+    assert not result["success"]
+    assert "Unrecognised date format" in result["error"]
+
+
+def test_json_output_matches_records():
+    df = pd.DataFrame({"year": [2019, 2020, 2021, 2022], "region": ["a", "a", "b", "b"], "v": [1.0, np.nan, 3.0, 4.0]})
+    records = predict_column(df, "v", time_column="year", group_column="region")
+    body = json.loads(predict_column_json(df, "v", time_column="year", group_column="region"))
+
+    assert body["predictions"] == records["predictions"]
+    assert {k: v for k, v in body.items() if k != "predictions"} == {k: v for k, v in records.items() if k != "predictions"}
+
+
+def test_all_columns_in_one_task():
+    df = pd.DataFrame({"year": range(2015, 2025), "a": np.arange(10.0), "b": np.arange(10.0) * 2})
+    body = json.loads(predict_columns_json(df, ["a", "b", "missing"], time_column="year", steps=1))
+
+    assert body["a"]["success"] and body["b"]["success"]
+    assert "error" in body["missing"]
+
+
+def test_lttb_keeps_endpoints_and_returns_n_out_sorted_indices():
+    rng = np.random.default_rng(0)
+    x = np.arange(1000.0)
+    y = np.cumsum(rng.normal(size=1000))
+    idx = lttb_indices(x, y, 50)
+
+    assert len(idx) == 50
+    assert idx[0] == 0 and idx[-1] == 999
+    assert (np.diff(idx) > 0).all()
+
+
+def test_lttb_small_and_oversized_targets():
+    x = np.arange(10.0)
+    y = x ** 2
+    assert list(lttb_indices(x, y, 2)) == [0, 9]
+    assert list(lttb_indices(x, y, 1)) == [0]
+    assert list(lttb_indices(x, y, 0)) == []
+    assert list(lttb_indices(x, y, 10)) == list(range(10))
+    assert list(lttb_indices(x, y, 25)) == list(range(10))
+
+
+def test_lttb_always_picks_a_spike():
+    x = np.arange(500.0)
+    y = np.zeros(500)
+    y[321] = 100.0
+    assert 321 in lttb_indices(x, y, 20)
+
+
+def history_frame():
+    history = pd.DataFrame({
+        "year": np.tile(np.arange(2000, 2100), 2),
+        "region": np.repeat(["a", "b"], 100),
+        "v": np.concatenate([np.arange(100.0), -np.arange(100.0)]),
+        "source": "original",
+    })
+    predicted = pd.DataFrame({"year": [2100, 2100], "region": ["a", "b"], "v": [100.0, -100.0], "source": "predicted"})
+    return pd.concat([history, predicted], ignore_index=True)
+
+
+def test_tail_and_lttb_are_applied_per_group():
+    combined = history_frame()
+    for mode in ("tail", "lttb"):
+        shaped = shape_history(combined, "v", "year", "region", history=mode, history_points=10)
+        original = shaped[shaped["source"] == "original"]
+
+        assert original.groupby("region").size().to_dict() == {"a": 10, "b": 10}
+        assert (shaped["source"] == "predicted").sum() == 2
+        # Rows stay in their original order
+        assert shaped.index.is_monotonic_increasing
+
+    tail = shape_history(combined, "v", "year", "region", history="tail", history_points=10)
+    assert tail[tail["source"] == "original"].groupby("region")["year"].min().tolist() == [2090, 2090]
+    lttb = shape_history(combined, "v", "year", "region", history="lttb", history_points=10)
+    assert lttb[lttb["source"] == "original"].groupby("region")["year"].agg(["min", "max"]).values.tolist() == [[2000, 2099]] * 2
+
+
+def test_history_none_returns_only_predictions():
+    combined = history_frame()
+    shaped = shape_history(combined, "v", "year", "region", history="none")
+    assert (shaped["source"] == "predicted").all()
+    assert len(shaped) == 2
+    assert shape_history(combined, "v", "year", "region", history="full") is combined
@@ -0,0 +1,48 @@
+from prompt_cache import PromptCache
+
+
+def test_exact_near_and_fresh_lookups():
+    cache = PromptCache()
+    cache.store("Sales data for 2023", "tabular", "csv-1")
+
+    assert cache.lookup("  sales DATA for 2023 ", "tabular") == ("csv-1", "exact")
+    assert cache.lookup("2023 sales dataset", "tabular") == ("csv-1", "near")
+    assert cache.lookup("weather readings for Paris", "tabular") is None
+    assert cache.stats == {"exact": 1, "near": 1, "fresh": 1}
+
+
+def test_no_hits_across_dataset_types():
+    cache = PromptCache()
+    cache.store("monthly sales by region", "tabular", "csv-1")
+
+    assert cache.lookup("monthly sales by region", "time_series") is None
+    assert cache.lookup("sales by region monthly", "time_series") is None
+
+
+def test_different_year_is_below_the_threshold():
+    cache = PromptCache()
+    cache.store("sales data for 2023", "tabular", "csv-1")
+    assert cache.lookup("sales data for 2024", "tabular") is None
+
+
+def test_lru_eviction_clears_lsh_buckets():
+    cache = PromptCache(max_entries=2)
+    cache.store("customer churn by month", "tabular", "churn")
+    cache.store("hospital patient admissions", "tabular", "patients")
+    # Touch the first entry so the second one is the least recently used
+    assert cache.lookup("customer churn by month", "tabular") == ("churn", "exact")
+    cache.store("airline flight delays", "tabular", "flights")
+
+    assert len(cache) == 2
+    assert cache.lookup("hospital patient admissions", "tabular") is None
+    evicted = ("tabular", "hospital patient admissions")
+    assert all(evicted not in bucket for table in cache._buckets for bucket in table.values())
+    assert all(bucket for table in cache._buckets for bucket in table.values())
+
+
+def test_max_entries_zero_disables_the_cache():
+    cache = PromptCache(max_entries=0)
+    cache.store("sales data for 2023", "tabular", "csv-1")
+
+    assert len(cache) == 0
+    assert cache.lookup("sales data for 2023", "tabular") is None
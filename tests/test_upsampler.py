@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+from upsampler import upsample_dataframe, fit_marginals, TIME_AXIS_MAX_YEAR
+
+
+def monthly_seed(periods=20):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "Date": pd.date_range("2020-01-01", periods=periods, freq="MS").strftime("%Y-%m-%d"),
+        "Sales": (100 + 5 * np.arange(periods) + rng.normal(0, 2, periods)).round().astype(int),
+        "Temperature": rng.normal(50, 10, periods).round(1),
+    })
+
+
+def test_smaller_target_is_a_slice():
+    seed = monthly_seed()
+    pd.testing.assert_frame_equal(upsample_dataframe(seed, 5), seed.head(5))
+
+
+def test_regular_dates_continue_along_their_frequency():
+    seed = monthly_seed().sample(frac=1, random_state=1)
+    out = upsample_dataframe(seed, 1000, seed=0)
+
+    assert len(out) == 1000
+    dates = pd.to_datetime(out["Date"], format="%Y-%m-%d")
+    assert dates.is_monotonic_increasing
+    assert dates.is_unique
+    assert (dates.dt.day == 1).all()
+    expected = pd.date_range("2020-01-01", periods=1000, freq="MS")
+    assert (dates.to_numpy() == expected.to_numpy()).all()
+
+
+def test_values_follow_the_time_trend():
+    out = upsample_dataframe(monthly_seed(), 200, seed=0)
+    sales = out["Sales"].to_numpy(dtype=float)
+    assert sales[40:60].mean() > sales[:20].mean() + 100
+    # Past the horizon (one seed span after the last seed month) the level stops rising
+    assert abs(sales[-20:].mean() - sales[40:60].mean()) < 15
+    # Temperature has no trend in the seed and must not drift
+    assert abs(out["Temperature"].iloc[-50:].mean() - 50) < 10
+
+
+def test_year_columns_stay_bounded():
+    seed = pd.DataFrame({"Year": range(2015, 2025), "Revenue": np.linspace(10.0, 30.0, 10)})
+    out = upsample_dataframe(seed, 1_000_000, seed=0)
+
+    assert len(out) == 1_000_000
+    assert out["Year"].min() == 2015
+    assert out["Year"].max() <= TIME_AXIS_MAX_YEAR
+    assert out["Year"].is_monotonic_increasing
+    # The trend stops one seed span past the seed instead of running on to 2200
+    assert out["Revenue"].max() < 30.0 + 2 * 20.0
+    assert out["Revenue"].min() >= 0
+
+
+def test_panel_key_is_cycled_per_timestamp():
+    months = pd.date_range("2021-01-01", periods=12, freq="MS").strftime("%m/%d/%Y")
+    seed = pd.DataFrame({
+        "date": np.repeat(months, 2),
+        "region": ["North", "South"] * 12,
+        "units": np.ravel([[10 + i, 100 + 2 * i] for i in range(12)]),
+    })
+    out = upsample_dataframe(seed, 60, seed=0, dataset_type="time_series")
+
+    per_date = out.groupby("date")["region"].apply(sorted)
+    assert all(regions == ["North", "South"] for regions in per_date)
+    assert pd.to_datetime(out["date"]).is_monotonic_increasing
+    last = out.tail(2).set_index("region")["units"]
+    assert last["South"] > last["North"]
+
+
+def test_irregular_dates_are_sampled_not_extended():
+    rng = np.random.default_rng(3)
+    seed = pd.DataFrame({
+        "name": list("abcdefghij"),
+        "hired": pd.to_datetime(rng.integers(1.5e9, 1.7e9, 10), unit="s").strftime("%Y-%m-%d"),
+        "salary": rng.integers(40, 90, 10) * 1000,
+    })
+    out = upsample_dataframe(seed, 50, seed=0)
+    hired = pd.to_datetime(out["hired"])
+
+    assert hired.min() >= pd.to_datetime(seed["hired"]).min()
+    assert hired.max() <= pd.to_datetime(seed["hired"]).max()
+
+
+def test_rows_past_the_last_year_are_not_stacked_on_the_last_timestamps():
+    seed = pd.DataFrame({"Year": range(2015, 2025), "Revenue": np.linspace(10.0, 30.0, 10)})
+    out = upsample_dataframe(seed, 2000, seed=0)
+
+    per_year = out["Year"].value_counts()
+    assert set(per_year.index) == set(range(2015, TIME_AXIS_MAX_YEAR + 1))
+    assert per_year.max() < 30
+
+
+def test_evenly_spaced_measurements_are_not_ids():
+    seed = pd.DataFrame({
+        "employee_id": range(1001, 1021),
+        "row": range(1, 21),
+        "salary": np.arange(40000, 60000, 1000),
+    })
+    model = fit_marginals(seed)
+    assert model["columns"]["employee_id"]["kind"] == "sequence"
+    assert model["columns"]["row"]["kind"] == "sequence"
+    assert model["columns"]["salary"]["kind"] == "numeric"
+
+    out = upsample_dataframe(seed, 200, seed=0)
+    assert out["salary"].between(40000, 59000).all()
+    assert (out["employee_id"] == np.arange(1001, 1201)).all()
+
+
+def test_irregular_dates_are_not_a_time_series_axis():
+    rng = np.random.default_rng(5)
+    seed = pd.DataFrame({
+        "joined": pd.to_datetime(rng.integers(1.3e9, 1.7e9, 12), unit="s").strftime("%Y-%m-%d"),
+        "headcount": rng.integers(5, 50, 12),
+    })
+    out = upsample_dataframe(seed, 500, seed=0, dataset_type="time_series")
+
+    assert pd.to_datetime(out["joined"]).max() <= pd.to_datetime(seed["joined"]).max()
+
+
+def test_floats_keep_the_seed_decimal_places():
+    seed = pd.DataFrame({"Price": [12.5, 9.9, 14.0, 11.3, 10.8, 13.1], "Weight": [0.25, 1.5, 0.75, 2.05, 1.1, 0.6]})
+    out = upsample_dataframe(seed, 100, seed=0)
+
+    assert (out["Price"] == out["Price"].round(1)).all()
+    assert (out["Weight"] == out["Weight"].round(2)).all()
+    assert (out["Weight"] != out["Weight"].round(1)).any()
@@ -0,0 +1,71 @@
+import gzip
+import io
+import zipfile
+
+import pytest
+
+import utils
+from utils import UploadTooLargeError, open_csv_upload, read_csv_upload
+
+CSV = b"a,b\n" + b"1,2\n" * 1000
+
+
+def zip_bytes(name="data.csv", content=CSV):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(name, content)
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.mark.parametrize("upload, filename", [
+    (lambda: io.BytesIO(CSV), "data.csv"),
+    (lambda: io.BytesIO(gzip.compress(CSV)), "data.csv.gz"),
+    (zip_bytes, "data.zip"),
+])
+def test_reads_plain_and_compressed_uploads(upload, filename):
+    df, encoding = read_csv_upload(upload(), filename)
+    assert df.shape == (1000, 2)
+    assert encoding == "utf-8"
+
+
+def test_decompression_is_bounded():
+    bomb = io.BytesIO(gzip.compress(b"a,b\n" + b"0,0\n" * 1_000_000))
+    stream = open_csv_upload(bomb, "bomb.gz", max_bytes=64 * 1024)
+    with pytest.raises(UploadTooLargeError):
+        while stream.read(8192):
+            pass
+    assert stream.bytes_read <= 64 * 1024 + 8192
+
+
+def test_oversized_upload_is_rejected(monkeypatch):
+    monkeypatch.setattr(utils, "MAX_UPLOAD_BYTES", 1024)
+    with pytest.raises(UploadTooLargeError):
+        read_csv_upload(io.BytesIO(gzip.compress(CSV)), "data.csv.gz")
+
+
+def test_zip_archive_is_closed():
+    stream = open_csv_upload(zip_bytes(), "data.zip")
+    archive = stream._closers[-1]
+    stream.read()
+    stream.close()
+    assert archive.fp is None
+
+
+def test_uploaded_file_stays_open_between_encodings():
+    upload = io.BytesIO("name\ncafé\n".encode("latin1"))
+    df, encoding = read_csv_upload(upload, "data.csv")
+    assert encoding == "latin1"
+    assert df["name"][0] == "café"
+    assert not upload.closed
+
+
+def test_missing_zstandard_is_reported(monkeypatch):
+    monkeypatch.setattr(utils, "zstandard", None)
+    with pytest.raises(ValueError, match="zstandard"):
+        read_csv_upload(io.BytesIO(b"\x28\xb5\x2f\xfd" + b"\x00" * 16), "data.csv.zst")
+
+
+def test_corrupt_zip_is_reported():
+    with pytest.raises(ValueError, match="corrupt"):
+        read_csv_upload(io.BytesIO(b"PK\x03\x04 not really a zip"), "data.zip")